@@ -4,21 +4,43 @@ Streamlit web application for RAG Chatbot
 """
 
 import streamlit as st
+import gc
+import html
 import os
+import queue
+import shutil
 import sys
 from pathlib import Path
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Add the project root to Python path
 project_root = Path(__file__).parent
-sys.path.append(str(project_root))
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
 from utils.config_loader import load_environment
+from utils.query_cache import QueryCache, SemanticQueryCache
 from models.embedding_model import EmbeddingModel
+from retrieval.document_loader import DocumentLoader
+from retrieval.chunking_strategy import ChunkingStrategy
 from retrieval.vector_store import VectorStore
 from retrieval.retriever import Retriever
 from generation.llm_chain import LLMChain
 
+# Directory where uploaded documents are saved before ingestion
+RAW_DOCUMENTS_DIR = Path("data/raw_documents")
+
+# Number of chunks buffered before flushing them to the vector store during ingestion
+INGEST_FLUSH_SIZE = 256
+# Chunk batches the background chunking thread may get ahead of embedding
+INGEST_QUEUE_SIZE = 8
+# Upper bound on threads used to load and chunk uploaded files in parallel
+MAX_LOAD_WORKERS = 8
+
 # Page configuration
 st.set_page_config(
     page_title="RAG Chatbot",
@@ -28,7 +50,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 3rem;
@@ -86,7 +108,119 @@ st.markdown("""
         border-left: 4px solid #f44336;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+def build_sources_html(sources) -> str:
+    """Build the escaped sources block for an assistant message as one HTML string"""
+    return "<span style='font-size:1.1rem;font-weight:600;color:#2196f3;'>Sources:</span><br>" + "<br>".join(
+        f'<div class="source-box"><span style="color:#1565c0;">📄</span> <span style="color:#374151;">{html.escape(source)}</span></div>'
+        for source in sources
+    )
+
+def iter_chunks(doc_loader, chunker, filenames):
+    """Yield chunks file by file so a whole corpus is never held in memory
+
+    Files are loaded and chunked on a thread pool. Twice as many files as
+    there are workers are kept queued, so a worker picks up the next file
+    as soon as it finishes one, even while a slow file holds up the head
+    of the queue; chunks are still yielded in upload order.
+    """
+    if not filenames:
+        return
+    
+    def load_and_chunk(fname):
+        return chunker.chunk_documents(doc_loader.load_document(fname))
+    
+    workers = min(MAX_LOAD_WORKERS, len(filenames))
+    pending_files = iter(filenames)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque(executor.submit(load_and_chunk, fname) for fname in islice(pending_files, 2 * workers))
+        while in_flight:
+            chunks = in_flight.popleft().result()
+            for fname in islice(pending_files, 1):
+                in_flight.append(executor.submit(load_and_chunk, fname))
+            yield from chunks
+
+def _offer(batches: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put an item on the queue, giving up if the consumer has stopped"""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def produce_chunk_batches(chunks, batches: queue.Queue, stop: threading.Event):
+    """Group chunks into flush-sized batches on a background thread, ending with None"""
+    try:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= INGEST_FLUSH_SIZE:
+                if not _offer(batches, batch, stop):
+                    return
+                batch = []
+        if batch and not _offer(batches, batch, stop):
+            return
+        _offer(batches, None, stop)
+    except Exception as e:
+        _offer(batches, e, stop)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+@st.cache_resource(show_spinner=False)
+def _get_query_cache():
+    """Create the answered-query cache once per process"""
+    return QueryCache()
+
+@st.cache_resource(show_spinner=False)
+def _get_semantic_cache():
+    """Create the paraphrase-matching answer cache once per process"""
+    return SemanticQueryCache()
+
+def _clear_answer_caches():
+    """Drop memoized answers after the index or generation settings change"""
+    _get_query_cache().clear()
+    _get_semantic_cache().clear()
+
+@st.cache_resource(show_spinner=False)
+def _get_embedding_model():
+    """Load the embedding model once per process"""
+    return EmbeddingModel()
+
+@st.cache_resource(show_spinner=False)
+def _get_vector_store(_embeddings):
+    """Open the Chroma vector store once per process"""
+    return VectorStore(_embeddings)
+
+@st.cache_resource(show_spinner=False)
+def _get_retriever(_vector_store):
+    """Create the retriever once per process"""
+    return Retriever(_vector_store)
+
+@st.cache_resource(show_spinner=False)
+def _get_llm_chain():
+    """Create the Groq LLM chain once per process"""
+    return LLMChain()
+
+@st.cache_resource(show_spinner=False)
+def _get_document_loader():
+    """Create the document loader once per process"""
+    return DocumentLoader(str(RAW_DOCUMENTS_DIR))
+
+@st.cache_resource(show_spinner=False)
+def _get_chunker():
+    """Create the chunking strategy and its text splitter once per process"""
+    return ChunkingStrategy()
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _collection_info(_vector_store):
+    """Fetch collection metadata, reused for a few seconds across reruns"""
+    return _vector_store.get_collection_info()
 
 class RAGChatbotApp:
     """Streamlit app for RAG Chatbot"""
@@ -111,13 +245,13 @@ class RAGChatbotApp:
         try:
             with st.spinner("Initializing RAG system components..."):
              
-                self.embedding_model = EmbeddingModel()
+                self.embedding_model = _get_embedding_model()
                 
-                self.vector_store = VectorStore(self.embedding_model.get_embeddings())
+                self.vector_store = _get_vector_store(self.embedding_model.get_embeddings())
                 
-                self.retriever = Retriever(self.vector_store)
+                self.retriever = _get_retriever(self.vector_store)
                 
-                self.llm_chain = LLMChain()
+                self.llm_chain = _get_llm_chain()
                 
                 st.session_state.system_initialized = True
                 st.success("RAG system initialized successfully!")
@@ -132,7 +266,7 @@ class RAGChatbotApp:
             st.error("RAG system not initialized. Please check the configuration.")
             return False
         try:
-            collection_info = self.vector_store.get_collection_info()
+            collection_info = _collection_info(self.vector_store)
             total_docs = collection_info.get('total_documents', 0)
             
             if total_docs == 0:
@@ -170,9 +304,8 @@ class RAGChatbotApp:
                 st.markdown(message["content"])
                 
                 if message["role"] == "assistant" and message.get("sources"):
-                    st.markdown("<span style='font-size:1.1rem;font-weight:600;color:#2196f3;'>Sources:</span>", unsafe_allow_html=True)
-                    for source in message["sources"]:
-                        st.markdown(f'<div class="source-box"><span style="color:#1565c0;">📄</span> <span style="color:#374151;">{source}</span></div>', unsafe_allow_html=True)
+                    sources_html = message.get("sources_html") or build_sources_html(message["sources"])
+                    st.markdown(sources_html, unsafe_allow_html=True)
     
     def process_user_query(self, user_query: str):
         """Process a user query and generate response"""
@@ -186,61 +319,108 @@ class RAGChatbotApp:
             with st.chat_message("user"):
                 st.markdown(user_query)
 
+            query_cache = _get_query_cache()
+            semantic_cache = _get_semantic_cache()
+            cached = query_cache.get(user_query)
+            query_vector = None
+            if cached is None:
+                query_vector = self.vector_store.embedding_function.embed_query(user_query)
+                cached = semantic_cache.get(query_vector)
+
             with st.chat_message("assistant"):
-                with st.spinner("🔍 Searching for relevant information..."):
-                    uploaded_filenames = st.session_state.get("uploaded_filenames", None)
-                    if uploaded_filenames:
-                        from retrieval.document_loader import DocumentLoader
-                        from retrieval.chunking_strategy import ChunkingStrategy
-                        doc_loader = DocumentLoader("data/raw_documents")
-                        all_chunks = []
-                        for fname in uploaded_filenames:
-                            documents = doc_loader.load_document(fname)
-                            chunker = ChunkingStrategy()
-                            chunks = chunker.chunk_documents(documents)
-                            all_chunks.extend(chunks)
-                        
-                        self.vector_store.add_documents(all_chunks)
-                     
-                        retrieved_docs = []
-                        for chunk in all_chunks:
-                            if user_query.lower() in chunk.page_content.lower():
-                                retrieved_docs.append(chunk)
-                        
-                        if not retrieved_docs:
-                            retrieved_docs = self.retriever.retrieve_documents(user_query)
-                    else:
-                    
+                if cached is not None:
+                    response, sources = cached
+                    st.markdown(response)
+                else:
+                    with st.spinner("🔍 Searching for relevant information..."):
                         retrieved_docs = self.retriever.retrieve_documents(user_query)
 
                     if not retrieved_docs:
                         response = "No relevant documents found for your query. Please try rephrasing or check if documents are properly indexed."
                         sources = []
+                        st.markdown(response)
                     else:
                    
-                        context = "\n\n".join([doc.page_content for doc in retrieved_docs])
-                        
-                        response = self.llm_chain.generate_answer(user_query, context)
+                        context = "\n\n".join(doc.page_content for doc in retrieved_docs)
                    
-                        sources = list({os.path.basename(doc.metadata.get('source', 'Unknown')) for doc in retrieved_docs})
-
-                st.markdown(response)
+                        sources = list(dict.fromkeys(os.path.basename(doc.metadata.get('source', 'Unknown')) for doc in retrieved_docs))
+                        
+                        response = st.write_stream(self.llm_chain.generate_answer_stream(user_query, context))
+                        # Only successful generations reach the chain's answer cache; don't memoize error replies
+                        if self.llm_chain.has_cached_answer(user_query, context):
+                            query_cache.put(user_query, response, sources)
+                            semantic_cache.put(query_vector, response, sources)
 
               
-                if sources:
-                    st.markdown("<span style='font-size:1.1rem;font-weight:600;color:#2196f3;'>Sources:</span>", unsafe_allow_html=True)
-                    for source in sources:
-                        st.markdown(f'<div class="source-box"><span style="color:#1565c0;">📄</span> <span style="color:#374151;">{source}</span></div>', unsafe_allow_html=True)
+                sources_html = build_sources_html(sources) if sources else ""
+                if sources_html:
+                    st.markdown(sources_html, unsafe_allow_html=True)
 
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": response,
-                "sources": sources
+                "sources": sources,
+                "sources_html": sources_html
             })
 
         except Exception as e:
             st.error(f"Error processing query: {str(e)}")
     
+    def _persist_batch(self, chunks) -> bool:
+        """Embed new chunks in one batch and write them to the vector store in bulk"""
+        if not chunks:
+            return False
+        
+        # Skip chunks already indexed (and repeats within the batch) before paying for their embeddings
+        fresh = {}
+        for chunk in chunks:
+            fresh.setdefault(VectorStore.content_id(chunk.page_content, chunk.metadata), chunk)
+        for chunk_id in self.vector_store.get_existing_ids(list(fresh)):
+            del fresh[chunk_id]
+        if not fresh:
+            return True
+        
+        texts = [chunk.page_content for chunk in fresh.values()]
+        try:
+            # One call per flush lets sentence-transformers length-sort the whole batch before padding
+            vectors = self.embedding_model.embed_documents(texts)
+        except Exception as e:
+            st.sidebar.error(f"Error embedding documents: {str(e)}")
+            return False
+        
+        return self.vector_store.add_embeddings(texts, vectors, [chunk.metadata for chunk in fresh.values()], ids=list(fresh))
+    
+    def _ingest_chunks(self, chunks) -> bool:
+        """Drain a chunk iterator into the vector store in bounded batches
+        
+        Chunking runs on a producer thread while this thread embeds and
+        writes the previous batch, with at most INGEST_QUEUE_SIZE batches
+        waiting in between.
+        """
+        batches = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        stop = threading.Event()
+        producer = threading.Thread(target=produce_chunk_batches, args=(chunks, batches, stop), daemon=True)
+        producer.start()
+        
+        persisted = False
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                if not self._persist_batch(batch):
+                    return False
+                persisted = True
+                del batch
+                gc.collect()
+        finally:
+            stop.set()
+            producer.join()
+        
+        return persisted
+    
     def display_sidebar_controls(self):
         """Display sidebar controls"""
         st.sidebar.header("Controls")
@@ -250,10 +430,12 @@ class RAGChatbotApp:
         upload_success = False
         uploaded_filenames = []
         if uploaded_files:
+            RAW_DOCUMENTS_DIR.mkdir(parents=True, exist_ok=True)
             for uploaded_file in uploaded_files:
-                save_path = Path("data/raw_documents") / uploaded_file.name
+                save_path = RAW_DOCUMENTS_DIR / uploaded_file.name
+                uploaded_file.seek(0)
                 with open(save_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+                    shutil.copyfileobj(uploaded_file, f, length=1 << 20)
                 uploaded_filenames.append(uploaded_file.name)
             st.sidebar.success(f"Uploaded and saved: {', '.join(uploaded_filenames)}")
             upload_success = True
@@ -261,19 +443,16 @@ class RAGChatbotApp:
             st.session_state["uploaded_filenames"] = uploaded_filenames
 
         if upload_success and st.sidebar.button("Ingest Uploaded Files"):
-            from retrieval.document_loader import DocumentLoader
-            from retrieval.chunking_strategy import ChunkingStrategy
-            doc_loader = DocumentLoader("data/raw_documents")
-            all_chunks = []
-            for fname in uploaded_filenames:
-                documents = doc_loader.load_document(fname)
-                chunker = ChunkingStrategy()
-                chunks = chunker.chunk_documents(documents)
-                all_chunks.extend(chunks)
-            success = self.vector_store.add_documents(all_chunks)
+            doc_loader = _get_document_loader()
+            chunker = _get_chunker()
+            success = self._ingest_chunks(iter_chunks(doc_loader, chunker, uploaded_filenames))
             if success:
                 st.sidebar.success("Documents ingested and indexed!")
                 st.session_state.documents_loaded = True
+                st.session_state.pop("uploaded_filenames", None)
+                _collection_info.clear()
+                _clear_answer_caches()
+                self.retriever.clear_cache()
             else:
                 st.sidebar.error("Failed to index the documents.")
 
@@ -283,21 +462,29 @@ class RAGChatbotApp:
             st.rerun()
 
         
-        st.sidebar.header("Settings")
+        with st.sidebar:
+            self.display_settings_controls()
+    
+    @st.fragment
+    def display_settings_controls(self):
+        """Display retrieval and LLM settings; interactions rerun only this fragment"""
+        st.header("Settings")
 
        
-        st.sidebar.subheader("Retrieval")
-        k_value = st.sidebar.slider("Documents to retrieve (k)", 1, 10, 4)
-        if st.sidebar.button("Update Retrieval"):
+        st.subheader("Retrieval")
+        k_value = st.slider("Documents to retrieve (k)", 1, 10, 4)
+        if st.button("Update Retrieval"):
             self.retriever.update_retrieval_parameters(k=k_value)
-            st.sidebar.success("Updated!")
+            _clear_answer_caches()
+            st.success("Updated!")
 
       
-        st.sidebar.subheader("LLM")
-        temperature = st.sidebar.slider("Temperature", 0.0, 1.0, 0.7, 0.1)
-        if st.sidebar.button("Update LLM"):
+        st.subheader("LLM")
+        temperature = st.slider("Temperature", 0.0, 1.0, 0.7, 0.1)
+        if st.button("Update LLM"):
             self.llm_chain.update_llm_parameters(temperature=temperature)
-            st.sidebar.success("Updated!")
+            _clear_answer_caches()
+            st.success("Updated!")
     
     def run_system_tests(self):
         """Run system tests"""
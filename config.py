@@ -4,22 +4,127 @@ Configuration file for RAG Chatbot
 Centralizes all configuration settings and provides easy access to them.
 """
 
+import functools
+import importlib.util
 import os
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from utils.config_loader import load_environment, refresh_settings
+
+# Module written next to .env by Config.save_to_env; loading it skips .env parsing
+COMPILED_ENV_MODULE = "env_compiled"
+
+def _bool(value: str) -> bool:
+    """Parse a "true"/"false" environment value"""
+    return value.lower() == "true"
+
+# (environment variable, Config attribute, type, default) for every env-driven setting
+_ENV_SCHEMA = [
+    # Chroma DB settings
+    ("CHROMA_PERSIST_DIR", "chroma_persist_dir", Path, "./chroma_db"),
+    ("CHROMA_COLLECTION_NAME", "collection_name", str, "rag_documents"),
+    
+    # Embedding model settings
+    ("EMBEDDING_MODEL", "embedding_model", str, "all-MiniLM-L6-v2"),
+    ("EMBEDDING_DEVICE", "embedding_device", str, "auto"),
+    ("EMBEDDING_NORMALIZE", "embedding_normalize", _bool, "true"),
+    
+    # Document processing settings
+    ("CHUNK_SIZE", "chunk_size", int, "1000"),
+    ("CHUNK_OVERLAP", "chunk_overlap", int, "200"),
+    ("MAX_CHUNK_SIZE", "max_chunk_size", int, "2000"),
+    
+    # Retrieval settings
+    ("DEFAULT_K", "default_k", int, "4"),
+    ("MAX_K", "max_k", int, "10"),
+    ("SEARCH_TYPE", "search_type", str, "similarity"),
+    
+    # Groq LLM settings
+    ("GROQ_API_KEY", "groq_api_key", str, None),
+    ("GROQ_MODEL", "groq_model", str, "llama3-70b-8192"),
+    ("TEMPERATURE", "temperature", float, "0.7"),
+    ("MAX_TOKENS", "max_tokens", int, "4096"),
+    
+    # Streamlit app settings
+    ("STREAMLIT_PORT", "streamlit_port", int, "8501"),
+    ("STREAMLIT_HOST", "streamlit_host", str, "localhost"),
+    ("STREAMLIT_DEBUG", "streamlit_debug", _bool, "false"),
+    
+    # Logging settings
+    ("LOG_LEVEL", "log_level", str, "INFO"),
+    ("LOG_FILE", "log_file", str, "rag_chatbot.log"),
+    
+    # Performance settings
+    ("BATCH_SIZE", "batch_size", int, "32"),
+    ("MAX_WORKERS", "max_workers", int, "4"),
+    ("CACHE_EMBEDDINGS", "cache_embeddings", _bool, "true"),
+    
+    # Security settings
+    ("ENABLE_RATE_LIMITING", "enable_rate_limiting", _bool, "true"),
+    ("MAX_REQUESTS_PER_MINUTE", "max_requests_per_minute", int, "60"),
+    
+    # Feature flags
+    ("ENABLE_RERANKING", "enable_reranking", _bool, "false"),
+    ("ENABLE_SUMMARIZATION", "enable_summarization", _bool, "true"),
+    ("ENABLE_QUESTION_GENERATION", "enable_question_generation", _bool, "true"),
+    ("ENABLE_FACT_CHECKING", "enable_fact_checking", _bool, "true"),
+]
+
+def _memoized_config(method):
+    """Cache a get_*_config result on the instance until update_config runs; callers get their own copy"""
+    @functools.wraps(method)
+    def wrapper(self):
+        cache = self._config_cache
+        if method.__name__ not in cache:
+            cache[method.__name__] = method(self)
+        return dict(cache[method.__name__])
+    return wrapper
 
 class Config:
-    """Configuration class for RAG Chatbot"""
+    """Configuration class for RAG Chatbot (a process-wide singleton)"""
+    
+    _instance = None
+    
+    def __new__(cls):
+        """Return the single shared configuration instance"""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
     
     def __init__(self):
         """Initialize configuration with default values"""
+        if getattr(self, "_initialized", False):
+            return
+        self._config_cache = {}
+        self._validated: Optional[bool] = None
+        self._errors: List[str] = []
         self._load_environment()
         self._set_defaults()
+        self._initialized = True
     
     def _load_environment(self):
-        """Load environment variables"""
-        from dotenv import load_dotenv
-        load_dotenv()
+        """Load environment variables, preferring the compiled env module when it is current"""
+        if not self._load_compiled_environment():
+            load_environment()
+    
+    def _load_compiled_environment(self, env_file: str = ".env") -> bool:
+        """Load variables from the compiled env module next to env_file; returns False if missing, stale or unreadable"""
+        env_path = Path(env_file)
+        compiled_file = env_path.parent / f"{COMPILED_ENV_MODULE}.py"
+        try:
+            if env_path.exists() and env_path.stat().st_mtime > compiled_file.stat().st_mtime:
+                return False
+            spec = importlib.util.spec_from_file_location(COMPILED_ENV_MODULE, compiled_file)
+            compiled = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(compiled)
+            env_values = dict(compiled.ENV)
+        except Exception:
+            # Missing, partially written or hand-edited module: fall back to parsing .env
+            return False
+        
+        os.environ.update({key: value for key, value in env_values.items() if key not in os.environ})
+        refresh_settings()
+        return True
     
     def _set_defaults(self):
         """Set default configuration values"""
@@ -29,54 +134,11 @@ class Config:
         self.raw_documents_dir = self.data_dir / "raw_documents"
         self.processed_chunks_dir = self.data_dir / "processed_chunks"
         
-        # Chroma DB settings
-        self.chroma_persist_dir = Path(os.getenv("CHROMA_PERSIST_DIR", "./chroma_db"))
-        self.collection_name = os.getenv("CHROMA_COLLECTION_NAME", "rag_documents")
-        
-        # Embedding model settings
-        self.embedding_model = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-        self.embedding_device = os.getenv("EMBEDDING_DEVICE", "cpu")
-        self.embedding_normalize = os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true"
-        
-        # Document processing settings
-        self.chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
-        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "200"))
-        self.max_chunk_size = int(os.getenv("MAX_CHUNK_SIZE", "2000"))
-        
-        # Retrieval settings
-        self.default_k = int(os.getenv("DEFAULT_K", "4"))
-        self.max_k = int(os.getenv("MAX_K", "10"))
-        self.search_type = os.getenv("SEARCH_TYPE", "similarity")
-        
-        # Groq LLM settings
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.groq_model = os.getenv("GROQ_MODEL", "llama3-70b-8192")
-        self.temperature = float(os.getenv("TEMPERATURE", "0.7"))
-        self.max_tokens = int(os.getenv("MAX_TOKENS", "4096"))
-        
-        # Streamlit app settings
-        self.streamlit_port = int(os.getenv("STREAMLIT_PORT", "8501"))
-        self.streamlit_host = os.getenv("STREAMLIT_HOST", "localhost")
-        self.streamlit_debug = os.getenv("STREAMLIT_DEBUG", "false").lower() == "true"
-        
-        # Logging settings
-        self.log_level = os.getenv("LOG_LEVEL", "INFO")
-        self.log_file = os.getenv("LOG_FILE", "rag_chatbot.log")
-        
-        # Performance settings
-        self.batch_size = int(os.getenv("BATCH_SIZE", "32"))
-        self.max_workers = int(os.getenv("MAX_WORKERS", "4"))
-        self.cache_embeddings = os.getenv("CACHE_EMBEDDINGS", "true").lower() == "true"
-        
-        # Security settings
-        self.enable_rate_limiting = os.getenv("ENABLE_RATE_LIMITING", "true").lower() == "true"
-        self.max_requests_per_minute = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "60"))
-        
-        # Feature flags
-        self.enable_reranking = os.getenv("ENABLE_RERANKING", "false").lower() == "true"
-        self.enable_summarization = os.getenv("ENABLE_SUMMARIZATION", "true").lower() == "true"
-        self.enable_question_generation = os.getenv("ENABLE_QUESTION_GENERATION", "true").lower() == "true"
-        self.enable_fact_checking = os.getenv("ENABLE_FACT_CHECKING", "true").lower() == "true"
+        # Environment-driven settings, read from a single snapshot of os.environ
+        env = dict(os.environ)
+        for env_key, attr, cast, default in _ENV_SCHEMA:
+            value = env.get(env_key, default)
+            setattr(self, attr, cast(value) if value is not None else None)
     
     def get_groq_api_key(self) -> str:
         """Get Groq API key"""
@@ -92,6 +154,7 @@ class Config:
         """Get documents directory"""
         return self.raw_documents_dir
     
+    @_memoized_config
     def get_embedding_model_config(self) -> Dict[str, Any]:
         """Get embedding model configuration"""
         return {
@@ -100,6 +163,7 @@ class Config:
             "normalize_embeddings": self.embedding_normalize
         }
     
+    @_memoized_config
     def get_chunking_config(self) -> Dict[str, Any]:
         """Get chunking configuration"""
         return {
@@ -108,6 +172,7 @@ class Config:
             "max_chunk_size": self.max_chunk_size
         }
     
+    @_memoized_config
     def get_retrieval_config(self) -> Dict[str, Any]:
         """Get retrieval configuration"""
         return {
@@ -116,6 +181,7 @@ class Config:
             "search_type": self.search_type
         }
     
+    @_memoized_config
     def get_llm_config(self) -> Dict[str, Any]:
         """Get LLM configuration"""
         return {
@@ -124,6 +190,7 @@ class Config:
             "max_tokens": self.max_tokens
         }
     
+    @_memoized_config
     def get_streamlit_config(self) -> Dict[str, Any]:
         """Get Streamlit configuration"""
         return {
@@ -132,6 +199,7 @@ class Config:
             "debug": self.streamlit_debug
         }
     
+    @_memoized_config
     def get_performance_config(self) -> Dict[str, Any]:
         """Get performance configuration"""
         return {
@@ -140,6 +208,7 @@ class Config:
             "cache_embeddings": self.cache_embeddings
         }
     
+    @_memoized_config
     def get_feature_flags(self) -> Dict[str, bool]:
         """Get feature flags"""
         return {
@@ -149,8 +218,11 @@ class Config:
             "fact_checking": self.enable_fact_checking
         }
     
-    def validate_config(self) -> bool:
-        """Validate configuration settings"""
+    def validate_config(self, force: bool = False) -> bool:
+        """Validate configuration settings; the result is cached unless force is set"""
+        if not force and self._validated is not None:
+            return self._validated
+        
         errors = []
         
         # Check required settings
@@ -171,53 +243,62 @@ class Config:
         if self.temperature < 0 or self.temperature > 2:
             errors.append("TEMPERATURE must be between 0 and 2")
         
+        self._errors = errors
+        self._validated = not errors
+        
         if errors:
             print("Configuration validation failed:")
             for error in errors:
                 print(f"   - {error}")
-            return False
         
-        return True
+        return self._validated
+    
+    def get_validation_errors(self) -> List[str]:
+        """Get the errors found by the last validate_config run"""
+        return list(self._errors)
+    
+    @functools.cached_property
+    def _config_report(self) -> str:
+        """Formatted configuration report, built once until update_config runs"""
+        lines = [
+            "RAG Chatbot Configuration:",
+            "=" * 40,
+            f"Project Root: {self.project_root}",
+            f"Documents Directory: {self.raw_documents_dir}",
+            f"Chroma DB Directory: {self.chroma_persist_dir}",
+            f"Collection Name: {self.collection_name}",
+            f"\nEmbedding Model: {self.embedding_model}",
+            f"Device: {self.embedding_device}",
+            f"Chunk Size: {self.chunk_size}",
+            f"Chunk Overlap: {self.chunk_overlap}",
+            f"\nDefault K: {self.default_k}",
+            f"Search Type: {self.search_type}",
+            f"\nGroq Model: {self.groq_model}",
+            f"Temperature: {self.temperature}",
+            f"Max Tokens: {self.max_tokens}",
+            f"\nStreamlit Port: {self.streamlit_port}",
+            f"Streamlit Host: {self.streamlit_host}",
+            f"\nBatch Size: {self.batch_size}",
+            f"Max Workers: {self.max_workers}",
+            "\nFeature Flags:",
+        ]
+        for feature, enabled in self.get_feature_flags().items():
+            status = "Enabled" if enabled else "Disabled"
+            lines.append(f"   {feature}: {status}")
+        return "\n".join(lines)
     
     def print_config(self):
         """Print current configuration"""
-        print("RAG Chatbot Configuration:")
-        print("=" * 40)
-        
-        print(f"Project Root: {self.project_root}")
-        print(f"Documents Directory: {self.raw_documents_dir}")
-        print(f"Chroma DB Directory: {self.chroma_persist_dir}")
-        print(f"Collection Name: {self.collection_name}")
-        
-        print(f"\nEmbedding Model: {self.embedding_model}")
-        print(f"Device: {self.embedding_device}")
-        print(f"Chunk Size: {self.chunk_size}")
-        print(f"Chunk Overlap: {self.chunk_overlap}")
-        
-        print(f"\nDefault K: {self.default_k}")
-        print(f"Search Type: {self.search_type}")
-        
-        print(f"\nGroq Model: {self.groq_model}")
-        print(f"Temperature: {self.temperature}")
-        print(f"Max Tokens: {self.max_tokens}")
-        
-        print(f"\nStreamlit Port: {self.streamlit_port}")
-        print(f"Streamlit Host: {self.streamlit_host}")
-        
-        print(f"\nBatch Size: {self.batch_size}")
-        print(f"Max Workers: {self.max_workers}")
-        
-        print(f"\nFeature Flags:")
-        flags = self.get_feature_flags()
-        for feature, enabled in flags.items():
-            status = "Enabled" if enabled else "Disabled"
-            print(f"   {feature}: {status}")
+        print(self._config_report)
     
     def update_config(self, **kwargs):
         """Update configuration values"""
         for key, value in kwargs.items():
             if hasattr(self, key):
                 setattr(self, key, value)
+                self._config_cache.clear()
+                self._validated = None
+                self.__dict__.pop("_config_report", None)
                 print(f"Updated {key}: {value}")
             else:
                 print(f"Unknown configuration key: {key}")
@@ -279,16 +360,28 @@ ENABLE_QUESTION_GENERATION={str(self.enable_question_generation).lower()}
 ENABLE_FACT_CHECKING={str(self.enable_fact_checking).lower()}
 """
         
+        env_values = dict(
+            line.split("=", 1) for line in env_content.splitlines()
+            if line and not line.startswith("#")
+        )
+        compiled_file = Path(env_file).parent / f"{COMPILED_ENV_MODULE}.py"
+        
         try:
             with open(env_file, 'w') as f:
                 f.write(env_content)
-            print(f"Configuration saved to {env_file}")
+            with open(compiled_file, 'w') as f:
+                f.write("# Generated automatically by Config.save_to_env; do not edit\n")
+                f.write(f"ENV = {env_values!r}\n")
+            print(f"Configuration saved to {env_file} and {compiled_file}")
         except Exception as e:
             print(f"Failed to save configuration: {e}")
 
-# Global configuration instance
-config = Config()
-
 def get_config() -> Config:
-    """Get global configuration instance"""
-    return config
+    """Get global configuration instance, created on first use"""
+    return Config()
+
+def __getattr__(name: str):
+    """Build the global `config` lazily so importing this module does no work"""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,47 @@
-from typing import List, Dict, Any, Optional
+import hashlib
+import threading
+from functools import cached_property, wraps
+from typing import List, Dict, Any, Optional, Iterator
+from cachetools import TTLCache
 from langchain_groq import ChatGroq
 from langchain.schema import Document
 from langchain.chains import RetrievalQA
 from langchain.chains.question_answering import load_qa_chain
 from langchain.schema.runnable import RunnablePassthrough
 from langchain.schema.output_parser import StrOutputParser
-from utils.config_loader import get_groq_api_key, get_groq_model_name, get_temperature
+from utils.config_loader import get_groq_api_key, get_groq_model_name, get_temperature, get_max_workers
 from .prompt_templates import PromptTemplates
 
+def _error_reply(action: str, error: Exception) -> str:
+    """Log an LLM failure and build the apology returned to the user"""
+    print(f"Error {action}: {error}")
+    return f"Sorry, I encountered an error while {action}: {str(error)}"
+
+def _llm_safe(action: str):
+    """Decorate an LLM call so failures are logged and returned as an apology string"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except Exception as e:
+                return _error_reply(action, e)
+        return wrapper
+    return decorator
+
+def _format_docs(docs) -> str:
+    """Join retrieved documents into a single context string"""
+    return "\n\n".join([doc.page_content for doc in docs])
+
+# Built-in templates whose formatter is bound to an LLMChain attribute
+BOUND_FORMATTERS = {
+    'rag_basic': '_format_rag',
+    'summary': '_format_summary',
+    'question_generation': '_format_questions',
+    'fact_check': '_format_fact_check',
+    'detailed_analysis': '_format_analysis',
+}
+
 class LLMChain:
     """Class to handle LLM generation using Groq"""
     
@@ -15,15 +49,39 @@ class LLMChain:
         """Initialize LLM chain with Groq"""
         self.model_name = model_name or get_groq_model_name()
         self.temperature = temperature or get_temperature()
-        self.llm = None
         self.prompt_templates = PromptTemplates()
-        self._initialize_llm()
+        # Bind the hot-path formatters once; rebind only when a template is replaced
+        for template_name in (*BOUND_FORMATTERS, 'rag_chat'):
+            self._bind_template(template_name)
+        self.prompt_templates.add_listener(self._bind_template)
+        self._answer_cache = TTLCache(maxsize=256, ttl=3600)
+        self._answer_cache_lock = threading.Lock()
     
-    def _initialize_llm(self):
+    @cached_property
+    def llm(self) -> ChatGroq:
+        """Groq LLM client, created on first use"""
+        return self._initialize_llm()
+    
+    def _bind_template(self, template_name: str):
+        """Bind a built-in template's formatter (or the chat template) to its attribute"""
+        if template_name == 'rag_chat':
+            self._rag_chat_template = self.prompt_templates.get_template('rag_chat')
+        elif template_name in BOUND_FORMATTERS:
+            setattr(self, BOUND_FORMATTERS[template_name], self.prompt_templates.get_formatter(template_name))
+    
+    def _format_answer_prompt(self, query: str, context: str, template_name: str):
+        """Format the answer prompt, using the bound templates for the built-in RAG prompts"""
+        if template_name == 'rag_basic':
+            return self._format_rag(context=context, question=query)
+        if template_name == 'rag_chat':
+            return self._rag_chat_template.format_messages(context=context, question=query)
+        return self.prompt_templates.get_formatter(template_name)(context=context, question=query)
+    
+    def _initialize_llm(self) -> ChatGroq:
         """Initialize the Groq LLM"""
         try:
             groq_api_key = get_groq_api_key()
-            self.llm = ChatGroq(
+            llm = ChatGroq(
                 groq_api_key=groq_api_key,
                 model_name=self.model_name,
                 temperature=self.temperature
@@ -31,72 +89,118 @@ class LLMChain:
             print(f"Groq LLM initialized successfully")
             print(f"   Model: {self.model_name}")
             print(f"   Temperature: {self.temperature}")
+            return llm
         except Exception as e:
             print(f"Error initializing Groq LLM: {e}")
             raise
     
+    def _answer_cache_key(self, query: str, context: str, template_name: str) -> tuple:
+        """Build the answer cache key from the query and a digest of the context"""
+        context_hash = hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+        return (template_name, query, context_hash)
+    
+    def _get_cached_answer(self, key: tuple) -> Optional[str]:
+        """Return a cached answer for the key, if any"""
+        with self._answer_cache_lock:
+            return self._answer_cache.get(key)
+    
+    def _cache_answer(self, key: tuple, answer: str):
+        """Store a generated answer in the cache"""
+        with self._answer_cache_lock:
+            self._answer_cache[key] = answer
+    
+    def has_cached_answer(self, query: str, context: str, template_name: str = 'rag_basic') -> bool:
+        """Check whether a successful answer for this query and context is cached"""
+        return self._get_cached_answer(self._answer_cache_key(query, context, template_name)) is not None
+    
+    @_llm_safe("generating the answer")
     def generate_answer(self, query: str, context: str, template_name: str = 'rag_basic') -> str:
         """Generate answer using the LLM with context"""
+        key = self._answer_cache_key(query, context, template_name)
+        cached = self._get_cached_answer(key)
+        if cached is not None:
+            return cached
+        
+        formatted_prompt = self._format_answer_prompt(query, context, template_name)
+        answer = self.llm.invoke(formatted_prompt).content
+        self._cache_answer(key, answer)
+        return answer
+    
+    def generate_answer_stream(self, query: str, context: str, template_name: str = 'rag_basic') -> Iterator[str]:
+        """Generate an answer using the LLM with context, yielding tokens as they arrive"""
         try:
+            key = self._answer_cache_key(query, context, template_name)
+            cached = self._get_cached_answer(key)
+            if cached is not None:
+                yield cached
+                return
             
-            if template_name == 'rag_chat':
-                prompt = self.prompt_templates.get_template(template_name)
-                formatted_prompt = prompt.format_messages(context=context, question=query)
-                response = self.llm.invoke(formatted_prompt)
-                return response.content
-            else:
-                prompt = self.prompt_templates.get_template(template_name)
-                formatted_prompt = prompt.format(context=context, question=query)
-                response = self.llm.invoke(formatted_prompt)
-                return response.content
+            formatted_prompt = self._format_answer_prompt(query, context, template_name)
+            
+            parts = []
+            for chunk in self.llm.stream(formatted_prompt):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+            
+            self._cache_answer(key, "".join(parts))
                 
         except Exception as e:
-            print(f"Error generating answer: {e}")
-            return f"Sorry, I encountered an error while generating the answer: {str(e)}"
+            yield _error_reply("generating the answer", e)
     
+    @_llm_safe("generating the summary")
     def generate_summary(self, text: str) -> str:
         """Generate a summary of the given text"""
-        try:
-            prompt = self.prompt_templates.get_template('summary')
-            formatted_prompt = prompt.format(text=text)
-            response = self.llm.invoke(formatted_prompt)
-            return response.content
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            return f"Sorry, I encountered an error while generating the summary: {str(e)}"
+        return self.llm.invoke(self._format_summary(text=text)).content
     
+    @_llm_safe("generating questions")
     def generate_questions(self, context: str) -> str:
         """Generate questions based on the given context"""
-        try:
-            prompt = self.prompt_templates.get_template('question_generation')
-            formatted_prompt = prompt.format(context=context)
-            response = self.llm.invoke(formatted_prompt)
-            return response.content
-        except Exception as e:
-            print(f"Error generating questions: {e}")
-            return f"Sorry, I encountered an error while generating questions: {str(e)}"
+        return self.llm.invoke(self._format_questions(context=context)).content
     
+    @_llm_safe("fact-checking")
     def fact_check(self, context: str, statement: str) -> str:
         """Fact-check a statement against the given context"""
-        try:
-            prompt = self.prompt_templates.get_template('fact_check')
-            formatted_prompt = prompt.format(context=context, statement=statement)
-            response = self.llm.invoke(formatted_prompt)
-            return response.content
-        except Exception as e:
-            print(f"Error during fact-checking: {e}")
-            return f"Sorry, I encountered the error while fact-checking: {str(e)}"
+        return self.llm.invoke(self._format_fact_check(context=context, statement=statement)).content
     
+    @_llm_safe("providing analysis")
     def detailed_analysis(self, context: str, question: str) -> str:
         """Provide detailed analysis based on the given context"""
+        return self.llm.invoke(self._format_analysis(context=context, question=question)).content
+    
+    def _batch_invoke(self, formatted_prompts: List[str], action: str) -> List[str]:
+        """Send several prompts to the LLM concurrently, returning one answer or error message per prompt"""
+        if not formatted_prompts:
+            return []
+        
         try:
-            prompt = self.prompt_templates.get_template('detailed_analysis')
-            formatted_prompt = prompt.format(context=context, question=question)
-            response = self.llm.invoke(formatted_prompt)
-            return response.content
+            responses = self.llm.batch(
+                formatted_prompts,
+                config={"max_concurrency": get_max_workers()},
+                return_exceptions=True
+            )
         except Exception as e:
-            print(f"Error during detailed analysis: {e}")
-            return f"Sorry, I encountered an error while providing analysis: {str(e)}"
+            return [_error_reply(action, e)] * len(formatted_prompts)
+        
+        return [
+            _error_reply(action, response) if isinstance(response, Exception) else response.content
+            for response in responses
+        ]
+    
+    def generate_summaries(self, texts: List[str]) -> List[str]:
+        """Generate summaries for several texts in one batched LLM call"""
+        formatted_prompts = [self._format_summary(text=text) for text in texts]
+        return self._batch_invoke(formatted_prompts, "generating the summary")
+    
+    def generate_questions_batch(self, contexts: List[str]) -> List[str]:
+        """Generate questions for several contexts in one batched LLM call"""
+        formatted_prompts = [self._format_questions(context=context) for context in contexts]
+        return self._batch_invoke(formatted_prompts, "generating questions")
+    
+    def fact_check_batch(self, context: str, statements: List[str]) -> List[str]:
+        """Fact-check several statements against the same context in one batched LLM call"""
+        formatted_prompts = [self._format_fact_check(context=context, statement=statement) for statement in statements]
+        return self._batch_invoke(formatted_prompts, "fact-checking")
     
     def create_retrieval_qa_chain(self, retriever) -> RetrievalQA:
         """Create a RetrievalQA chain"""
@@ -119,12 +223,8 @@ class LLMChain:
     def create_custom_chain(self, retriever) -> Any:
         """Create a custom chain using LCEL (LangChain Expression Language)"""
         try:
-            
-            def format_docs(docs):
-                return "\n\n".join(doc.page_content for doc in docs)
-            
             rag_chain = (
-                {"context": retriever | format_docs, "question": RunnablePassthrough()}
+                {"context": retriever | _format_docs, "question": RunnablePassthrough()}
                 | self.prompt_templates.get_template('rag_basic')
                 | self.llm
                 | StrOutputParser()
@@ -173,7 +273,9 @@ class LLMChain:
         if temperature is not None:
             self.temperature = temperature
         
-        self._initialize_llm()
+        with self._answer_cache_lock:
+            self._answer_cache.clear()
+        self.__dict__.pop("llm", None)
         print(f"Updated LLM parameters: model={self.model_name}, temperature={self.temperature}")
     
     def get_llm_info(self) -> Dict[str, Any]:
@@ -5,14 +5,22 @@ class PromptTemplates:
     """Class to manage prompt templates for the RAG chatbot"""
     
     def __init__(self):
-        """Initialize prompt templates"""
-        self.templates = self._create_templates()
+        """Initialize prompt templates; each built-in template is created on first use"""
+        self._factories = {
+            'rag_basic': self._make_rag_basic,
+            'rag_chat': self._make_rag_chat,
+            'summary': self._make_summary,
+            'question_generation': self._make_question_generation,
+            'fact_check': self._make_fact_check,
+            'detailed_analysis': self._make_detailed_analysis,
+        }
+        self.templates = {}
+        self._formatters = {}
+        # Callbacks notified with a template name whenever that template is replaced
+        self._listeners = []
     
-    def _create_templates(self) -> dict:
-        """Create all prompt templates"""
-        templates = {}
-        
-        # Basic RAG prompt template
+    def _make_rag_basic(self) -> PromptTemplate:
+        """Create the basic RAG prompt template"""
         rag_template = """You are a helpful AI assistant that answers questions based on the provided context. 
         Use only the information from the context to answer the question. If the context doesn't contain enough 
         information to answer the question, say "I don't have enough information to answer this question based on the provided context."
@@ -24,23 +32,14 @@ class PromptTemplates:
 
         Answer:"""
         
-        templates['rag_basic'] = PromptTemplate(
+        return PromptTemplate(
             input_variables=["context", "question"],
             template=rag_template
         )
-        
-       
-        chat_rag_template = """You are a helpful AI assistant that answers questions based on the provided context. 
-        Use only the information from the context to answer the question. If the context doesn't contain enough 
-        information to answer the question, say "I don't have enough information to answer this question based on the provided context."
-
-        Context:
-        {context}
-
-        Human: {question}
-        Assistant:"""
-        
-        templates['rag_chat'] = ChatPromptTemplate.from_messages([
+    
+    def _make_rag_chat(self) -> ChatPromptTemplate:
+        """Create the chat RAG prompt template"""
+        return ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(
                 "You are a helpful AI assistant that answers questions based on the provided context. "
                 "Use only the information from the context to answer the question. If the context doesn't contain enough "
@@ -50,8 +49,9 @@ class PromptTemplates:
                 "Context:\n{context}\n\nQuestion: {question}"
             )
         ])
-        
-       
+    
+    def _make_summary(self) -> PromptTemplate:
+        """Create the summarization prompt template"""
         summary_template = """You are a helpful AI assistant that summarizes documents. 
         Please provide a concise summary of the following text, highlighting the key points and main ideas.
 
@@ -60,12 +60,13 @@ class PromptTemplates:
 
         Summary:"""
         
-        templates['summary'] = PromptTemplate(
+        return PromptTemplate(
             input_variables=["text"],
             template=summary_template
         )
-        
-        
+    
+    def _make_question_generation(self) -> PromptTemplate:
+        """Create the question generation prompt template"""
         question_gen_template = """Based on the following context, generate 3 relevant questions that could be asked about this information.
         Make sure the questions are specific and would require the context to answer properly.
 
@@ -75,11 +76,13 @@ class PromptTemplates:
         Generated Questions:
         1. """
         
-        templates['question_generation'] = PromptTemplate(
+        return PromptTemplate(
             input_variables=["context"],
             template=question_gen_template
         )
-        
+    
+    def _make_fact_check(self) -> PromptTemplate:
+        """Create the fact-checking prompt template"""
         fact_check_template = """You are a helpful AI assistant that fact-checks information. 
         Based on the provided context, determine if the following statement is true, false, or if there's insufficient information.
 
@@ -90,11 +93,13 @@ class PromptTemplates:
 
         Analysis:"""
         
-        templates['fact_check'] = PromptTemplate(
+        return PromptTemplate(
             input_variables=["context", "statement"],
             template=fact_check_template
         )
-       
+    
+    def _make_detailed_analysis(self) -> PromptTemplate:
+        """Create the detailed analysis prompt template"""
         detailed_analysis_template = """You are a helpful AI assistant that provides detailed analysis. 
         Based on the provided context, please provide a comprehensive analysis of the following question.
         Include relevant details, examples, and connections from the context.
@@ -106,53 +111,65 @@ class PromptTemplates:
 
         Detailed Analysis:"""
         
-        templates['detailed_analysis'] = PromptTemplate(
+        return PromptTemplate(
             input_variables=["context", "question"],
             template=detailed_analysis_template
         )
-        
-        return templates
     
     def get_template(self, template_name: str) -> PromptTemplate:
-        """Get a specific prompt template by name"""
-        if template_name not in self.templates:
-            raise ValueError(f"Template '{template_name}' not found. Available templates: {list(self.templates.keys())}")
-        return self.templates[template_name]
+        """Get a specific prompt template by name, creating built-in templates on first use"""
+        template = self.templates.get(template_name)
+        if template is None:
+            if template_name not in self._factories:
+                raise ValueError(f"Template '{template_name}' not found. Available templates: {self.get_available_templates()}")
+            template = self.templates[template_name] = self._factories[template_name]()
+        return template
     
     def get_available_templates(self) -> list:
         """Get list of available template names"""
-        return list(self.templates.keys())
+        return list(dict.fromkeys([*self._factories, *self.templates]))
+    
+    def get_formatter(self, template_name: str):
+        """Get a cached formatter for a template, specialized to str.format for plain f-string templates"""
+        formatter = self._formatters.get(template_name)
+        if formatter is None:
+            template = self.get_template(template_name)
+            if isinstance(template, PromptTemplate) and template.template_format == "f-string" and not template.partial_variables:
+                formatter = template.template.format
+            else:
+                formatter = template.format
+            self._formatters[template_name] = formatter
+        return formatter
+    
+    def add_listener(self, callback):
+        """Register a callback(template_name) run after a template is replaced, so bound formatters can be refreshed"""
+        self._listeners.append(callback)
     
     def format_rag_prompt(self, context: str, question: str, template_name: str = 'rag_basic') -> str:
         """Format a RAG prompt with context and question"""
-        template = self.get_template(template_name)
-        return template.format(context=context, question=question)
+        return self.get_formatter(template_name)(context=context, question=question)
     
     def format_summary_prompt(self, text: str) -> str:
         """Format a summarization prompt"""
-        template = self.get_template('summary')
-        return template.format(text=text)
+        return self.get_formatter('summary')(text=text)
     
     def format_question_gen_prompt(self, context: str) -> str:
         """Format a question generation prompt"""
-        template = self.get_template('question_generation')
-        return template.format(context=context)
+        return self.get_formatter('question_generation')(context=context)
     
     def format_fact_check_prompt(self, context: str, statement: str) -> str:
         """Format a fact-checking prompt"""
-        template = self.get_template('fact_check')
-        return template.format(context=context, statement=statement)
+        return self.get_formatter('fact_check')(context=context, statement=statement)
     
     def format_detailed_analysis_prompt(self, context: str, question: str) -> str:
         """Format a detailed analysis prompt"""
-        template = self.get_template('detailed_analysis')
-        return template.format(context=context, question=question)
+        return self.get_formatter('detailed_analysis')(context=context, question=question)
     
     def print_template_info(self):
         """Print information about available templates"""
         print("\nAvailable Prompt Templates:")
-        for template_name in self.templates:
-            template = self.templates[template_name]
+        for template_name in self.get_available_templates():
+            template = self.get_template(template_name)
             input_vars = template.input_variables
             print(f"   {template_name}: {input_vars}")
     
@@ -164,6 +181,9 @@ class PromptTemplates:
                 template=template_text
             )
             self.templates[template_name] = custom_template
+            self._formatters.pop(template_name, None)
+            for callback in self._listeners:
+                callback(template_name)
             print(f"Custom template '{template_name}' created successfully")
             return custom_template
         except Exception as e:
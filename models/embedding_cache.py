@@ -0,0 +1,105 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Distinct query strings whose embeddings are kept in memory
+QUERY_CACHE_SIZE = 4096
+
+class EmbeddingCache:
+    """SQLite-backed store of embeddings keyed by a hash of model name and text"""
+    
+    def __init__(self, path: str):
+        """Open (or create) the cache database"""
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._connection.commit()
+    
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Build the cache key for a text embedded by a given model"""
+        return hashlib.blake2b(f"{model_name}\0{text}".encode(), digest_size=32).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for whichever keys are present"""
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+    
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors under their keys"""
+        if not items:
+            return
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._connection.commit()
+    
+    def close(self):
+        """Close the cache database"""
+        with self._lock:
+            self._connection.close()
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(path: str) -> EmbeddingCache:
+    """Open one EmbeddingCache per database file and share it across the process"""
+    return EmbeddingCache(path)
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes embed_query and, given a disk cache, skips re-encoding known documents"""
+    
+    def __init__(self, embeddings: Embeddings, maxsize: int = QUERY_CACHE_SIZE, cache: EmbeddingCache = None, model_name: str = None):
+        """Wrap an embedding function with an in-memory LRU of query vectors and an optional disk cache of document vectors"""
+        self.embeddings = embeddings
+        self.cache = cache
+        # Part of every cache key, so vectors from another model are never reused
+        self.model_name = model_name or getattr(embeddings, "model_name", type(embeddings).__name__)
+        self._embed_query = lru_cache(maxsize=maxsize)(self._encode_query)
+    
+    def _encode_query(self, text: str) -> tuple:
+        """Embed a query with the wrapped function; tuples keep cached vectors immutable"""
+        return tuple(self.embeddings.embed_query(text))
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the vector for a query seen before"""
+        return list(self._embed_query(text))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reading cached vectors from disk and encoding only the misses"""
+        if self.cache is None:
+            return self.embeddings.embed_documents(texts)
+        
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+            self.cache.put_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+    
+    def clear(self):
+        """Forget every cached query vector"""
+        self._embed_query.cache_clear()
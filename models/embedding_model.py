@@ -1,40 +1,96 @@
+import torch
+from huggingface_hub import snapshot_download
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from utils.config_loader import get_embedding_model_name
+from utils.config_loader import get_embedding_model_name, get_embedding_device, get_cache_embeddings, get_embedding_cache_path
+from .embedding_cache import EmbeddingCache, get_embedding_cache
 import os
 
+# Sentences per forward pass on GPU/MPS; CPU keeps sentence-transformers' default
+ACCELERATOR_BATCH_SIZE = 128
+CPU_BATCH_SIZE = 32
+
 class EmbeddingModel:
     """Class to handle embedding model operations"""
     
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, device: str = None):
         """Initialize embedding model"""
         self.model_name = model_name or get_embedding_model_name()
+        self.device = self._resolve_device(device or get_embedding_device())
         self.embeddings = None
+        self._dimension = None
+        self.cache = get_embedding_cache(get_embedding_cache_path()) if get_cache_embeddings() else None
         self._initialize_model()
     
+    @staticmethod
+    def _resolve_device(device: str) -> str:
+        """Resolve 'auto' to the best available torch device"""
+        if device != "auto":
+            return device
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+        return "cpu"
+    
+    def _model_kwargs(self) -> dict:
+        """Build SentenceTransformer kwargs, loading FP16 weights on accelerators"""
+        model_kwargs = {'device': self.device}
+        if self.device != "cpu":
+            model_kwargs['model_kwargs'] = {'torch_dtype': torch.float16}
+        return model_kwargs
+    
+    def _encode_kwargs(self) -> dict:
+        """Build encode kwargs with a batch size suited to the device"""
+        return {
+            'normalize_embeddings': True,
+            'batch_size': CPU_BATCH_SIZE if self.device == "cpu" else ACCELERATOR_BATCH_SIZE
+        }
+    
+    @staticmethod
+    def _model_available(model_name: str) -> bool:
+        """Cheaply check that a model exists locally or on the Hub by fetching only its config.json"""
+        if os.path.isdir(model_name):
+            return True
+        # Plain transformer ids (e.g. bert-base-uncased) load as given; bare short names may live under sentence-transformers/
+        repo_ids = [model_name] if "/" in model_name else [model_name, f"sentence-transformers/{model_name}"]
+        # Try the local HF cache for every candidate before paying a network round trip
+        for local_files_only in (True, False):
+            for repo_id in repo_ids:
+                try:
+                    snapshot_download(repo_id=repo_id, allow_patterns=["config.json"], local_files_only=local_files_only)
+                    return True
+                except Exception:
+                    continue
+        return False
+    
+    def _build_embeddings(self, model_name: str) -> HuggingFaceEmbeddings:
+        """Construct HuggingFace embeddings for a model on the resolved device"""
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=self._model_kwargs(),
+            encode_kwargs=self._encode_kwargs()
+        )
+    
     def _initialize_model(self):
         """Initialize the HuggingFace embedding model"""
-        try:
-            
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=self.model_name,
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
-            print(f"Embedding model '{self.model_name}' initialized successfully")
-        except Exception as e:
-            print(f"Error initializing embedding model: {e}")
-            
-            fallback_model = "sentence-transformers/all-MiniLM-L6-v2"
-            print(f"Trying fallback model: {fallback_model}")
+        if self._model_available(self.model_name):
             try:
-                self.embeddings = HuggingFaceEmbeddings(
-                    model_name=fallback_model,
-                    model_kwargs={'device': 'cpu'},
-                    encode_kwargs={'normalize_embeddings': True}
-                )
-                print(f"Fallback embedding model initialized successfully")
-            except Exception as e2:
-                raise Exception(f"Failed to initialize any embedding model: {e2}")
+                self.embeddings = self._build_embeddings(self.model_name)
+                print(f"Embedding model '{self.model_name}' initialized successfully on {self.device}")
+                return
+            except Exception as e:
+                print(f"Error initializing embedding model: {e}")
+        else:
+            print(f"Embedding model '{self.model_name}' not found locally or on the Hub")
+        
+        fallback_model = "sentence-transformers/all-MiniLM-L6-v2"
+        print(f"Trying fallback model: {fallback_model}")
+        self.embeddings = None
+        try:
+            self.embeddings = self._build_embeddings(fallback_model)
+            print(f"Fallback embedding model initialized successfully")
+        except Exception as e2:
+            raise Exception(f"Failed to initialize any embedding model: {e2}")
     
     def get_embeddings(self):
         """Get the embedding model instance"""
@@ -44,18 +100,40 @@ class EmbeddingModel:
         """Embed a single text string"""
         if not self.embeddings:
             raise ValueError("Embedding model not initialized")
-        return self.embeddings.embed_query(text)
+        return self.embed_documents([text])[0]
+    
+    def _encode(self, texts: list) -> list:
+        """Encode texts with one direct SentenceTransformer.encode call"""
+        vectors = self.embeddings.client.encode(
+            texts,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            **self._encode_kwargs()
+        )
+        return vectors.tolist()
     
     def embed_documents(self, texts: list) -> list:
-        """Embed a list of text documents"""
+        """Embed a list of text documents, reusing cached vectors and encoding only the misses"""
         if not self.embeddings:
             raise ValueError("Embedding model not initialized")
-        return self.embeddings.embed_documents(texts)
+        texts = [text.replace("\n", " ") for text in texts]
+        if self.cache is None:
+            return self._encode(texts)
+        
+        keys = [EmbeddingCache.make_key(self.embeddings.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            computed = dict(zip(missing, self._encode(list(missing.values()))))
+            self.cache.put_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of the embeddings"""
         if not self.embeddings:
             raise ValueError("Embedding model not initialized")
-    
-        test_embedding = self.embed_text("test")
-        return len(test_embedding)
+        
+        if self._dimension is None:
+            self._dimension = self.embeddings.client.get_sentence_embedding_dimension()
+        return self._dimension
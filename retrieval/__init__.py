@@ -1 +1,4 @@
 # Retrieval package for RAG chatbot
+from utils.config_loader import configure_logging
+
+configure_logging()
@@ -1,26 +1,90 @@
-from typing import List
+from collections import Counter
+from functools import lru_cache
+from typing import List, Iterable, Iterator
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from utils.config_loader import get_chunk_size, get_chunk_overlap
+from utils.config_loader import get_chunk_size, get_chunk_overlap, get_text_splitter
+
+# Separators a chunk may end on, strongest first
+_BREAKS = ("\n\n", "\n", " ")
+
+class OffsetTextSplitter:
+    """Text splitter that slides a window over the text and cuts at the strongest separator found with rfind"""
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        """Initialize splitter with chunk size and overlap in characters"""
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+    
+    def _chunk_end(self, text: str, start: int, limit: int, floor: int = 0) -> int:
+        """Pick the end of the strongest break in (max(start, floor), limit], preferring the back half of the window"""
+        for lower in (start + self.chunk_size // 2, start):
+            lower = max(lower, floor)
+            for separator in _BREAKS:
+                idx = text.rfind(separator, lower, limit - len(separator) + 1)
+                if idx >= 0:
+                    return idx + len(separator)
+        return limit
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most chunk_size characters, ending on the strongest break in each window"""
+        chunks = []
+        start = 0
+        end = 0
+        while start < len(text):
+            limit = start + self.chunk_size
+            # Every chunk must end past the previous one, so no chunk is a fragment of the last
+            end = len(text) if limit >= len(text) else self._chunk_end(text, start, limit, floor=end)
+            
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(text):
+                break
+            
+            # Start the next chunk just after the first word break inside the overlap region;
+            # without one, start at the chunk end rather than mid-word
+            idx = text.find(" ", end - self.chunk_overlap, end - 1)
+            next_start = idx + 1 if idx >= 0 else end
+            start = next_start if next_start > start else end
+        
+        return chunks
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Split documents into chunk Documents that keep their source metadata"""
+        return [
+            Document(page_content=chunk, metadata=dict(doc.metadata))
+            for doc in documents
+            for chunk in self.split_text(doc.page_content)
+        ]
+
+@lru_cache(maxsize=16)
+def _get_splitter(splitter: str, chunk_size: int, chunk_overlap: int):
+    """Build a text splitter once per (splitter, size, overlap); splitters are stateless and safe to share"""
+    if splitter == "offset":
+        return OffsetTextSplitter(chunk_size, chunk_overlap)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""],
+        is_separator_regex=False
+    )
 
 class ChunkingStrategy:
     """Class to handle document chunking strategies"""
     
-    def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, splitter: str = None):
         """Initialize chunking strategy"""
         self.chunk_size = chunk_size or get_chunk_size()
         self.chunk_overlap = chunk_overlap or get_chunk_overlap()
+        self.splitter = splitter or get_text_splitter()
         self.text_splitter = self._create_text_splitter()
     
-    def _create_text_splitter(self) -> RecursiveCharacterTextSplitter:
-        """Create the text splitter with configured parameters"""
-        return RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""],
-            is_separator_regex=False
-        )
+    def _create_text_splitter(self):
+        """Get the shared text splitter for the configured parameters"""
+        return _get_splitter(self.splitter, self.chunk_size, self.chunk_overlap)
     
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """Split documents into chunks"""
@@ -33,12 +97,10 @@ class ChunkingStrategy:
         print(f"   Chunk overlap: {self.chunk_overlap}")
         
         try:
-           
-            all_chunks = []
-            for i, doc in enumerate(documents):
-                chunks = self.text_splitter.split_documents([doc])
-                all_chunks.extend(chunks)
-                print(f"   Document {i+1}: {len(chunks)} chunks")
+            all_chunks = self.text_splitter.split_documents(documents)
+            chunk_counts = Counter(chunk.metadata.get('source', 'Unknown') for chunk in all_chunks)
+            for source, count in chunk_counts.items():
+                print(f"   {source}: {count} chunks")
             
             print(f"Total chunks created: {len(all_chunks)}")
             return all_chunks
@@ -47,6 +109,14 @@ class ChunkingStrategy:
             print(f"Error during chunking: {e}")
             return []
     
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yield chunks document by document, for streaming ingestion"""
+        for document in documents:
+            try:
+                yield from self.text_splitter.split_documents([document])
+            except Exception as e:
+                print(f"Error chunking document {document.metadata.get('source', 'Unknown')}: {e}")
+    
     def chunk_single_document(self, document: Document) -> List[Document]:
         """Split a single document into chunks"""
         try:
@@ -62,19 +132,22 @@ class ChunkingStrategy:
         if not chunks:
             return {"total_chunks": 0, "avg_chunk_length": 0, "min_length": 0, "max_length": 0}
         
-        chunk_lengths = [len(chunk.page_content) for chunk in chunks]
+        chunk_lengths = np.fromiter((len(chunk.page_content) for chunk in chunks), dtype=np.int64, count=len(chunks))
         
         return {
             "total_chunks": len(chunks),
-            "avg_chunk_length": sum(chunk_lengths) / len(chunk_lengths),
-            "min_length": min(chunk_lengths),
-            "max_length": max(chunk_lengths),
+            "avg_chunk_length": float(chunk_lengths.mean()),
+            "min_length": int(chunk_lengths.min()),
+            "max_length": int(chunk_lengths.max()),
             "chunk_size": self.chunk_size,
             "chunk_overlap": self.chunk_overlap
         }
     
-    def print_chunk_summary(self, chunks: List[Document]):
-        """Print a summary of the chunking process"""
+    def print_chunk_summary(self, chunks: List[Document], quiet: bool = False):
+        """Print a summary of the chunking process; quiet prints only the chunk count"""
+        if quiet:
+            print(f"Chunking Summary: {len(chunks)} chunks")
+            return
         stats = self.get_chunk_statistics(chunks)
         print("\nChunking Summary:")
         print(f"   Total chunks: {stats['total_chunks']}")
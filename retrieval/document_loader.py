@@ -1,5 +1,6 @@
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator
 from langchain_community.document_loaders import (
     PyPDFLoader,
     TextLoader,
@@ -31,14 +32,14 @@ class DocumentLoader:
             return []
         
         supported_files = []
-        for filename in os.listdir(self.documents_dir):
-            file_path = os.path.join(self.documents_dir, filename)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(filename)[1].lower()
-                if file_ext in self.supported_extensions:
-                    supported_files.append(filename)
-                else:
-                    print(f"Unsupported file type: {filename}")
+        with os.scandir(self.documents_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    name, dot, ext = entry.name.rpartition('.')
+                    if name and f"{dot}{ext}".lower() in self.supported_extensions:
+                        supported_files.append(entry.name)
+                    else:
+                        print(f"Unsupported file type: {entry.name}")
         
         return supported_files
     
@@ -75,19 +76,41 @@ class DocumentLoader:
             return []
         
         all_documents = []
-        for filename in supported_files:
-            documents = self.load_document(filename)
-            all_documents.extend(documents)
+        workers = min(os.cpu_count() or 1, len(supported_files))
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for documents in executor.map(self.load_document, supported_files):
+                        all_documents.extend(documents)
+            except Exception as e:
+                print(f"Parallel loading failed ({e}), loading documents serially")
+                all_documents = []
+                workers = 1
+        
+        if workers <= 1:
+            for filename in supported_files:
+                documents = self.load_document(filename)
+                all_documents.extend(documents)
         
         print(f"Total documents loaded: {len(all_documents)}")
         return all_documents
     
+    def iter_documents(self) -> Iterator[Document]:
+        """Yield documents file by file so the whole corpus is never held in memory"""
+        supported_files = self.get_supported_files()
+        if not supported_files:
+            print("No supported documents found")
+            return
+        
+        for filename in supported_files:
+            yield from self.load_document(filename)
+    
     def get_document_info(self, documents: List[Document]) -> Dict[str, Any]:
         """Get information about loaded documents"""
         if not documents:
             return {"total_documents": 0, "total_pages": 0, "sources": []}
         
-        sources = list(set([doc.metadata.get('source', 'Unknown') for doc in documents]))
+        sources = list(dict.fromkeys(doc.metadata.get('source', 'Unknown') for doc in documents))
         total_pages = len(documents)
         
         return {
@@ -97,8 +120,11 @@ class DocumentLoader:
             "average_page_length": sum(len(doc.page_content) for doc in documents) / total_pages if total_pages > 0 else 0
         }
     
-    def print_document_summary(self, documents: List[Document]):
-        """Print a summary of loaded documents"""
+    def print_document_summary(self, documents: List[Document], quiet: bool = False):
+        """Print a summary of loaded documents; quiet prints only the page count"""
+        if quiet:
+            print(f"Document Loading Summary: {len(documents)} pages/sections")
+            return
         info = self.get_document_info(documents)
         print("\nDocument Loading Summary:")
         print(f"   Total documents: {info['total_documents']}")
@@ -1,17 +1,59 @@
+import numpy as np
+import torch
 from sentence_transformers import CrossEncoder
+from utils.score_cache import ScoreCache
+
+# Cross-encoder batch size for scoring (query, document) pairs
+RERANK_BATCH_SIZE = 64
+
+def top_k_indices(scores: np.ndarray, top_k: int = None) -> np.ndarray:
+    """Indices of the top_k highest scores (all if top_k is None), best first"""
+    if top_k and top_k < len(scores):
+        # Select the top_k scores in O(N), then sort only those
+        idx = np.argpartition(-scores, top_k)[:top_k]
+        return idx[np.argsort(-scores[idx], kind="stable")]
+    return np.argsort(-scores, kind="stable")
 
 class Reranker:
     """Reranker using cross-encoder/ms-marco-MiniLM-L-6-v2"""
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
-        self.model = CrossEncoder(model_name)
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = None):
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = CrossEncoder(model_name, device=self.device)
+        if self.device == "cuda":
+            self.model.model.half()
+        # Pay CUDA context and kernel setup here rather than on the first query
+        self._predict([["warmup", "warmup"]])
+
+    def _predict(self, pairs: list) -> np.ndarray:
+        """Score (query, document) pairs without autograd bookkeeping"""
+        with torch.inference_mode():
+            return np.asarray(self.model.predict(
+                pairs,
+                batch_size=RERANK_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ))
 
-    def rerank(self, query: str, docs: list, top_k: int = None):
-        """Rerank documents based on query and return sorted docs (optionally top_k)"""
-        pairs = [[query, doc.page_content] for doc in docs]
-        scores = self.model.predict(pairs)
-        scored_docs = list(zip(docs, scores))
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        reranked = [doc for doc, score in scored_docs]
-        if top_k:
-            reranked = reranked[:top_k]
-        return reranked
+    def rerank(self, query: str, docs: list, top_k: int = None, cache: ScoreCache = None):
+        """Rerank documents based on query and return sorted docs (optionally top_k), reusing cached scores if given a cache"""
+        return [doc for doc, _ in self.rerank_with_scores(query, docs, top_k=top_k, cache=cache)]
+    
+    def rerank_with_scores(self, query: str, docs: list, top_k: int = None, cache: ScoreCache = None) -> list:
+        """Rerank documents and return sorted (doc, cross-encoder score) pairs (optionally top_k)"""
+        if not docs:
+            return []
+        if cache is None:
+            scores = self._predict([[query, doc.page_content] for doc in docs])
+        else:
+            query_key = cache.make_key(query)
+            keys = [(query_key, cache.make_key(doc.page_content)) for doc in docs]
+            cached = cache.get_many(keys)
+            missing = [i for i, key in enumerate(keys) if key not in cached]
+            if missing:
+                # Only pairs that were not scored recently go through the cross-encoder
+                fresh = self._predict([[query, docs[i].page_content] for i in missing])
+                computed = {keys[i]: score for i, score in zip(missing, fresh)}
+                cache.put_many(computed)
+                cached.update(computed)
+            scores = np.fromiter((cached[key] for key in keys), dtype=np.float32, count=len(keys))
+        return [(docs[i], float(scores[i])) for i in top_k_indices(scores, top_k)]
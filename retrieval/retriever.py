@@ -1,68 +1,184 @@
-from typing import List, Dict, Any
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from typing import List, Dict, Any, Optional
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
+from utils.config_loader import get_retriever_threads
+from utils.score_cache import ScoreCache
 from .vector_store import VectorStore
 from .reranker import Reranker
 
+logger = logging.getLogger(__name__)
+
+# "field:value" lookups such as source:report.pdf or tag:finance
+_FIELD_LOOKUP = re.compile(r"^\w+:\S+$")
+
+def _is_literal(query: str) -> bool:
+    """True for exact-match style queries (quoted phrase, field:value, at most two tokens) that reranking cannot improve"""
+    q = query.strip()
+    # Empty and whitespace-only queries count as literal on purpose: there is nothing for the cross-encoder to score against
+    return (len(q) > 1 and q.startswith('"') and q.endswith('"')) or len(q.split()) <= 2 or bool(_FIELD_LOOKUP.match(q))
+
+@lru_cache(maxsize=1)
+def _get_reranker() -> Reranker:
+    """Load the cross-encoder once per process and share it across retrievers and parameter changes"""
+    return Reranker()
+
 class Retriever:
     """Class to handle document retrieval from vector store, with optional reranking"""
-    def __init__(self, vector_store: VectorStore, k: int = 4, search_type: str = "similarity", use_reranker: bool = False, reranker_top_k: int = None):
-        """Initialize retriever with vector store and optional reranker"""
+    def __init__(self, vector_store: VectorStore, k: int = 4, search_type: str = "similarity", use_reranker: bool = False, reranker_top_k: int = None, fetch_k: int = None, reranker: Reranker = None):
+        """Initialize retriever with vector store and optional (possibly pre-built) reranker"""
         self.vector_store = vector_store
         self.k = k
         self.search_type = search_type
-        self.retriever = self._create_retriever()
         self.use_reranker = use_reranker
         self.reranker_top_k = reranker_top_k
-        self.reranker = Reranker() if use_reranker else None
+        self._fetch_k = fetch_k
+        self.reranker = (reranker or _get_reranker()) if use_reranker else None
+        self.retriever = self._create_retriever()
+        # Cross-encoder scores of recent (query, chunk) pairs, reused across turns
+        self.score_cache = ScoreCache()
+        # (query, documents) of the most recent retrieve_documents call
+        self._last_retrieval = None
+    
+    @property
+    def fetch_k(self) -> int:
+        """Number of candidates fetched for the reranker to reorder (default max(50, 10 * k))"""
+        return self._fetch_k or max(50, self.k * 10)
+    
+    @property
+    def search_k(self) -> int:
+        """Number of documents requested from the vector store per query"""
+        return self.fetch_k if self.use_reranker else self.k
+    
+    @cached_property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for per-query work in the batch methods, created on first use"""
+        return ThreadPoolExecutor(max_workers=get_retriever_threads(), thread_name_prefix="retriever")
     
     def _create_retriever(self) -> BaseRetriever:
         """Create a LangChain retriever from the vector store"""
         try:
             retriever = self.vector_store.vector_store.as_retriever(
                 search_type=self.search_type,
-                search_kwargs={"k": self.k}
+                search_kwargs={"k": self.search_k}
             )
-            print(f"Retriever initialized with k={self.k}, search_type={self.search_type}")
+            logger.info("Retriever initialized with k=%d, search_type=%s", self.search_k, self.search_type)
             return retriever
         except Exception as e:
-            print(f"Error creating retriever: {e}")
+            logger.error("Error creating retriever: %s", e)
             raise
     
-    def retrieve_documents(self, query: str) -> List[Document]:
-        """Retrieve relevant documents for a query, with optional reranking"""
+    def clear_cache(self):
+        """Forget the memoized last retrieval, e.g. after documents are added to the index"""
+        self._last_retrieval = None
+    
+    def _source_where(self, source_filter: str) -> Optional[dict]:
+        """Chroma metadata filter for sources whose path contains source_filter (case-insensitive), or None if none match"""
+        # Chroma's $contains only applies to document text, so resolve the substring to exact source paths
+        needle = source_filter.lower()
+        sources = [source for source in self.vector_store.get_sources() if needle in source.lower()]
+        if not sources:
+            return None
+        return {"source": sources[0]} if len(sources) == 1 else {"source": {"$in": sources}}
+    
+    def retrieve_documents(self, query: str, source_filter: str = None) -> List[Document]:
+        """Retrieve relevant documents for a query, optionally restricted to matching sources, with optional reranking"""
+        last = self._last_retrieval
+        if last is not None and last[0] == (query, source_filter):
+            return list(last[1])
         try:
-            print(f"Retrieving documents for query: '{query[:50]}...'")
-            documents = self.retriever.get_relevant_documents(query)
-            print(f"Retrieved {len(documents)} relevant documents before reranking")
-            if self.use_reranker and self.reranker:
-                print("Applying reranker (cross-encoder/ms-marco-MiniLM-L-6-v2)...")
-                documents = self.reranker.rerank(query, documents, top_k=self.reranker_top_k or self.k)
-                print(f"Documents reranked. Returning top {len(documents)}.")
+            logger.debug("Retrieving documents for query: '%.50s...'", query)
+            if source_filter:
+                where = self._source_where(source_filter)
+                if where is None:
+                    logger.debug("No indexed sources match filter: '%s'", source_filter)
+                    return []
+                # Same search_type as the unfiltered LangChain retriever (e.g. mmr), with the filter applied inside Chroma
+                documents = self.vector_store.vector_store.search(query, self.search_type, k=self.search_k, filter=where)
+            else:
+                documents = self.retriever.get_relevant_documents(query)
+            logger.debug("Retrieved %d relevant documents before reranking", len(documents))
+            if self.use_reranker and self.reranker and _is_literal(query):
+                logger.debug("Literal query, skipping reranker")
+                documents = documents[:self.reranker_top_k or self.k]
+            elif self.use_reranker and self.reranker:
+                logger.debug("Applying reranker (cross-encoder/ms-marco-MiniLM-L-6-v2)...")
+                documents = self.reranker.rerank(query, documents, top_k=self.reranker_top_k or self.k, cache=self.score_cache)
+                logger.debug("Documents reranked. Returning top %d.", len(documents))
+            self._last_retrieval = ((query, source_filter), list(documents))
             return documents
         except Exception as e:
-            print(f"Error during retrieval: {e}")
+            logger.error("Error during retrieval: %s", e)
             return []
     
+    async def aretrieve_documents(self, query: str) -> List[Document]:
+        """Retrieve relevant documents on a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self.retrieve_documents, query)
+    
+    async def aretrieve_documents_many(self, queries: List[str]) -> List[List[Document]]:
+        """Retrieve documents for several queries concurrently"""
+        return list(await asyncio.gather(*(self.aretrieve_documents(query) for query in queries)))
+    
     def retrieve_with_scores(self, query: str) -> List[tuple]:
         """Retrieve documents with similarity scores"""
         try:
-            print(f"Retrieving documents with scores for query: '{query[:50]}...'")
+            logger.debug("Retrieving documents with scores for query: '%.50s...'", query)
             
             
             results = self.vector_store.similarity_search_with_score(query, k=self.k)
             
-            print(f"Retrieved {len(results)} documents with scores")
+            logger.debug("Retrieved %d documents with scores", len(results))
             return results
             
         except Exception as e:
-            print(f"Error during retrieval with scores: {e}")
+            logger.error("Error during retrieval with scores: %s", e)
             return []
     
-    def get_retrieval_stats(self, query: str) -> Dict[str, Any]:
-        """Get statistics about the retrieval process"""
+    def retrieve_documents_batch(self, queries: List[str]) -> List[List[Document]]:
+        """Retrieve relevant documents for several queries (e.g. query expansions) in one vector store call"""
+        try:
+            logger.debug("Retrieving documents for %d queries in one batch", len(queries))
+            results = self.vector_store.similarity_search_batch(queries, k=self.search_k)
+            if self.use_reranker and self.reranker:
+                top_k = self.reranker_top_k or self.k
+                results = list(self.executor.map(
+                    lambda pair: pair[1][:top_k] if _is_literal(pair[0]) else self.reranker.rerank(pair[0], pair[1], top_k=top_k, cache=self.score_cache),
+                    zip(queries, results)
+                ))
+            return results
+        except Exception as e:
+            logger.error("Error during batched retrieval: %s", e)
+            return [[] for _ in queries]
+    
+    def retrieve_with_scores_batch(self, queries: List[str]) -> List[List[tuple]]:
+        """Retrieve documents with similarity scores for several queries in one vector store call"""
         try:
-            documents = self.retrieve_documents(query)
+            logger.debug("Retrieving documents with scores for %d queries", len(queries))
+            return self.vector_store.similarity_search_with_score_batch(queries, k=self.k)
+        except Exception as e:
+            logger.error("Error during batched retrieval with scores: %s", e)
+            return [[] for _ in queries]
+    
+    def retrieve_documents_containing(self, query: str, keyword: str) -> List[Document]:
+        """Retrieve relevant documents whose content contains a keyword, filtered by Chroma (case-sensitive, unlike the old lowercased scan)"""
+        try:
+            logger.debug("Retrieving documents containing '%s' for query: '%.50s...'", keyword, query)
+            documents = self.vector_store.similarity_search(query, k=self.k, where_document={"$contains": keyword})
+            logger.debug("Retrieved %d documents containing keyword", len(documents))
+            return documents
+        except Exception as e:
+            logger.error("Error during keyword retrieval: %s", e)
+            return []
+
+    def get_retrieval_stats(self, query: str, documents: List[Document] = None) -> Dict[str, Any]:
+        """Get statistics about the retrieval process, reusing already retrieved documents if given"""
+        try:
+            if documents is None:
+                documents = self.retrieve_documents(query)
             
             if not documents:
                 return {
@@ -73,26 +189,29 @@ class Retriever:
                     "sources": []
                 }
             
-            total_length = sum(len(doc.page_content) for doc in documents)
-            sources = list(set([doc.metadata.get('source', 'Unknown') for doc in documents]))
+            total_length = 0
+            sources = set()
+            for doc in documents:
+                total_length += len(doc.page_content)
+                sources.add(doc.metadata.get('source', 'Unknown'))
             
             return {
                 "query": query,
                 "documents_retrieved": len(documents),
                 "total_content_length": total_length,
                 "average_document_length": total_length / len(documents),
-                "sources": sources,
+                "sources": list(sources),
                 "retrieval_k": self.k,
                 "search_type": self.search_type
             }
             
         except Exception as e:
-            print(f"Error getting retrieval stats: {e}")
+            logger.error("Error getting retrieval stats: %s", e)
             return {}
     
-    def print_retrieval_summary(self, query: str):
-        """Print a summary of the retrieval process"""
-        stats = self.get_retrieval_stats(query)
+    def print_retrieval_summary(self, query: str, documents: List[Document] = None):
+        """Print a summary of the retrieval process, reusing already retrieved documents if given"""
+        stats = self.get_retrieval_stats(query, documents)
         if stats:
             print("\nRetrieval Summary:")
             print(f"   Query: {stats['query'][:100]}...")
@@ -103,33 +222,37 @@ class Retriever:
             print(f"   Retrieval k: {stats['retrieval_k']}")
             print(f"   Search type: {stats['search_type']}")
     
-    def update_retrieval_parameters(self, k: int = None, search_type: str = None, use_reranker: bool = None, reranker_top_k: int = None):
+    def update_retrieval_parameters(self, k: int = None, search_type: str = None, use_reranker: bool = None, reranker_top_k: int = None, fetch_k: int = None):
         """Update retrieval and reranker parameters"""
+        previous = (self.search_k, self.search_type)
         if k is not None:
             self.k = k
         if search_type is not None:
             self.search_type = search_type
         if use_reranker is not None:
             self.use_reranker = use_reranker
-            self.reranker = Reranker() if use_reranker else None
+            if not use_reranker:
+                self.reranker = None
+            elif self.reranker is None:
+                self.reranker = _get_reranker()
         if reranker_top_k is not None:
             self.reranker_top_k = reranker_top_k
+        if fetch_k is not None:
+            self._fetch_k = fetch_k
         
-        self.retriever = self._create_retriever()
-        print(f"Updated retrieval parameters: k={self.k}, search_type={self.search_type}, use_reranker={self.use_reranker}, reranker_top_k={self.reranker_top_k}")
+        # The LangChain retriever only depends on how many documents to fetch and how
+        if (self.search_k, self.search_type) != previous:
+            self.retriever = self._create_retriever()
+        self.clear_cache()
+        logger.info("Updated retrieval parameters: k=%d, search_type=%s, use_reranker=%s, reranker_top_k=%s", self.k, self.search_type, self.use_reranker, self.reranker_top_k)
     
     def get_document_preview(self, documents: List[Document], max_chars: int = 200) -> List[str]:
         """Get preview of retrieved documents"""
-        previews = []
-        for i, doc in enumerate(documents):
-            content = doc.page_content[:max_chars]
-            if len(doc.page_content) > max_chars:
-                content += "..."
-            
-            source = doc.metadata.get('source', 'Unknown')
-            previews.append(f"Document {i+1} ({source}): {content}")
-        
-        return previews
+        return [
+            f"Document {i} ({doc.metadata.get('source', 'Unknown')}): "
+            f"{doc.page_content[:max_chars]}{'...' if len(doc.page_content) > max_chars else ''}"
+            for i, doc in enumerate(documents, 1)
+        ]
     
     def print_document_previews(self, documents: List[Document], max_chars: int = 200):
         """Print previews of retrieved documents"""
@@ -139,9 +262,9 @@ class Retriever:
             print(f"   {preview}")
     
     def filter_documents_by_source(self, documents: List[Document], source_filter: str) -> List[Document]:
-        """Filter retrieved documents by source"""
+        """Filter already retrieved documents by source; prefer retrieve_documents(query, source_filter) to filter inside Chroma"""
         filtered = [doc for doc in documents if source_filter.lower() in doc.metadata.get('source', '').lower()]
-        print(f"Filtered {len(filtered)} documents by source filter: '{source_filter}'")
+        logger.debug("Filtered %d documents by source filter: '%s'", len(filtered), source_filter)
         return filtered
     
     def get_retrieval_quality_score(self, query: str, documents: List[Document]) -> float:
@@ -1,18 +1,52 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import List, Optional
+import threading
+import time
+import uuid
+from itertools import islice
+from typing import List, Optional, Iterable
 from langchain_chroma import Chroma
 from langchain.schema import Document
-from utils.config_loader import get_chroma_persist_directory
+from utils.config_loader import get_chroma_persist_directory, get_embed_batch_size, get_cache_embeddings, get_embedding_cache_path, get_embedding_model_name
+from models.embedding_cache import CachedQueryEmbeddings, get_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a get_collection_info result is reused when this instance has not written in between
+COLLECTION_INFO_TTL = 5
+
+# HNSW index settings for new collections: cosine matches sentence-transformer embeddings,
+# and a denser graph with a larger build beam trades ingest time for query speed at equal recall
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 128,
+    "hnsw:search_ef": 64,
+}
 
 class VectorStore:
     """Class to handle Chroma DB vector store operations"""
     
     def __init__(self, embedding_function, collection_name: str = "rag_documents", persist_directory: str = None):
         """Initialize vector store with Chroma DB"""
-        self.embedding_function = embedding_function
+        # Every search and add path embeds through this wrapper, so repeated queries and
+        # already-seen chunks (shared disk cache with EmbeddingModel) are encoded once
+        self.embedding_function = CachedQueryEmbeddings(
+            embedding_function,
+            cache=get_embedding_cache(get_embedding_cache_path()) if get_cache_embeddings() else None,
+            model_name=getattr(embedding_function, "model_name", None) or get_embedding_model_name()
+        )
         self.collection_name = collection_name
         self.persist_directory = persist_directory or get_chroma_persist_directory()
         self.vector_store = None
+        # (collection count, distinct source values) from the last get_sources scan
+        self._sources = None
+        # (monotonic timestamp, info) from the last get_collection_info call
+        self._collection_info = None
+        # Newest modification time under persist_directory when the store was last opened
+        self._last_mtime = None
         self._initialize_vector_store()
     
     def _initialize_vector_store(self):
@@ -24,88 +58,250 @@ class VectorStore:
             self.vector_store = Chroma(
                 collection_name=self.collection_name,
                 embedding_function=self.embedding_function,
-                persist_directory=self.persist_directory
+                persist_directory=self.persist_directory,
+                # Only applied when the collection is created; existing collections keep their index settings
+                collection_metadata=HNSW_METADATA
             )
+            self._last_mtime = self._persisted_mtime()
+            self._collection_info = None
             
-            print(f"Chroma vector store initialized successfully")
-            print(f"   Collection: {self.collection_name}")
-            print(f"   Persist directory: {self.persist_directory}")
+            logger.info("Chroma vector store initialized successfully (collection: %s, persist directory: %s)", self.collection_name, self.persist_directory)
             
         except Exception as e:
-            print(f"Error initializing vector store: {e}")
+            logger.error("Error initializing vector store: %s", e)
             raise
     
+    def _persisted_mtime(self) -> float:
+        """Newest modification time of persist_directory and its top-level entries; raises OSError if it is missing"""
+        # Segment directories are not descended into: HNSW files are rewritten in place without
+        # bumping their directory's mtime, but every Chroma write also lands in chroma.sqlite3 (or its WAL)
+        mtime = os.path.getmtime(self.persist_directory)
+        with os.scandir(self.persist_directory) as entries:
+            for entry in entries:
+                mtime = max(mtime, entry.stat().st_mtime)
+        return mtime
+    
     def add_documents(self, documents: List[Document]) -> bool:
         """Add documents to the vector store"""
         if not documents:
-            print("No documents to add")
+            logger.warning("No documents to add")
             return False
         
         try:
-            print(f"Adding {len(documents)} documents to vector store...")
+            logger.debug("Adding %d documents to vector store...", len(documents))
             
-            self.vector_store.add_documents(documents)
+            batch_size = get_embed_batch_size()
+            for start in range(0, len(documents), batch_size):
+                self.vector_store.add_documents(documents[start:start + batch_size])
             
-            print(f"Successfully added {len(documents)} documents to vector store")
+            self._collection_info = None
+            logger.debug("Successfully added %d documents to vector store", len(documents))
             return True
             
         except Exception as e:
-            print(f"Error adding documents to vector store: {e}")
+            logger.error("Error adding documents to vector store: %s", e)
             return False
     
+    async def aadd_documents(self, documents: List[Document]) -> bool:
+        """Add documents on a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(self.add_documents, documents)
+    
+    def add_documents_stream(self, documents: Iterable[Document], batch_size: int = 256) -> int:
+        """Add documents from an iterable in fixed-size batches; returns the number added"""
+        documents = iter(documents)
+        added = 0
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                break
+            if self.add_documents(batch):
+                added += len(batch)
+        
+        logger.info("Streamed %d documents into vector store", added)
+        return added
+    
     def add_texts(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> bool:
         """Add raw texts to the vector store"""
         if not texts:
-            print("No texts to add")
+            logger.warning("No texts to add")
             return False
         
         try:
-            print(f"Adding {len(texts)} texts to vector store...")
+            logger.debug("Adding %d texts to vector store...", len(texts))
            
-            self.vector_store.add_texts(texts, metadatas=metadatas)
+            batch_size = get_embed_batch_size()
+            for start in range(0, len(texts), batch_size):
+                self.vector_store.add_texts(
+                    texts[start:start + batch_size],
+                    metadatas=metadatas[start:start + batch_size] if metadatas else None
+                )
+            
+            
+            self._collection_info = None
+            logger.debug("Successfully added %d texts to vector store", len(texts))
+            return True
+            
+        except Exception as e:
+            logger.error("Error adding texts to vector store: %s", e)
+            return False
+    
+    @staticmethod
+    def content_id(text: str, metadata: Optional[dict] = None) -> str:
+        """Deterministic id for a chunk, from its source and content, so re-ingesting it maps to the same record"""
+        source = (metadata or {}).get('source', '')
+        return hashlib.blake2b(f"{source}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get_existing_ids(self, ids: List[str]) -> set:
+        """Return which of the given ids are already stored, with one batched lookup"""
+        if not ids:
+            return set()
+        try:
+            return set(self.vector_store._collection.get(ids=ids, include=[])["ids"])
+        except Exception as e:
+            logger.error("Error checking existing ids: %s", e)
+            return set()
+    
+    def add_embeddings(self, texts: List[str], embeddings: List[List[float]], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> bool:
+        """Add texts with precomputed embeddings to the vector store in one write"""
+        if not texts:
+            logger.warning("No texts to add")
+            return False
+        
+        try:
+            logger.debug("Adding %d pre-embedded texts to vector store...", len(texts))
+            
+            # Chroma rejects empty metadata dicts, which would fail the whole batch; send None instead
+            if metadatas is not None:
+                metadatas = [metadata or None for metadata in metadatas]
             
+            self.vector_store._collection.add(
+                ids=ids or [str(uuid.uuid4()) for _ in texts],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=metadatas
+            )
             
-            print(f"Successfully added {len(texts)} texts to vector store")
+            self._collection_info = None
+            logger.debug("Successfully added %d pre-embedded texts to vector store", len(texts))
             return True
             
         except Exception as e:
-            print(f"Error adding texts to vector store: {e}")
+            logger.error("Error adding embeddings to vector store: %s", e)
             return False
     
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Search for similar documents"""
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, where_document: Optional[dict] = None) -> List[Document]:
+        """Search for similar documents, optionally filtered by metadata or content inside Chroma"""
         try:
-            results = self.vector_store.similarity_search(query, k=k)
-            print(f"Found {len(results)} similar documents for query: '{query[:50]}...'")
+            results = self.vector_store.similarity_search(query, k=k, filter=filter, where_document=where_document)
+            logger.debug("Found %d similar documents for query: '%.50s...'", len(results), query)
             return results
         except Exception as e:
-            print(f"Error during similarity search: {e}")
+            logger.error("Error during similarity search: %s", e)
             return []
     
-    def similarity_search_with_score(self, query: str, k: int = 4) -> List[tuple]:
-        """Search for similar documents with similarity scores"""
+    def set_search_ef(self, ef: int) -> bool:
+        """Set the HNSW search beam width for subsequent queries (higher = better recall, slower)"""
         try:
-            results = self.vector_store.similarity_search_with_score(query, k=k)
-            print(f"Found {len(results)} similar documents with scores for query: '{query[:50]}...'")
+            self.vector_store._collection.modify(configuration={"hnsw": {"ef_search": ef}})
+            logger.info("HNSW search ef set to %d", ef)
+            return True
+        except Exception as e:
+            logger.error("Error setting HNSW search ef: %s", e)
+            return False
+    
+    def _query_batch(self, queries: List[str], k: int, include: List[str]) -> dict:
+        """Embed all queries in one call and run them through one Chroma query"""
+        # Encode with the wrapped function directly so queries never land in the document disk cache
+        query_embeddings = self.embedding_function.embeddings.embed_documents(queries)
+        return self.vector_store._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=include
+        )
+    
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """Search for similar documents for several queries with one embedding call and one Chroma query"""
+        if not queries:
+            return []
+        
+        try:
+            results = self._query_batch(queries, k, ["documents", "metadatas"])
+            
+            batched = []
+            for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"]):
+                batched.append([
+                    Document(id=doc_id, page_content=text, metadata=metadata or {})
+                    for doc_id, text, metadata in zip(ids, texts, metadatas)
+                ])
+            logger.debug("Found similar documents for %d queries in one batch", len(queries))
+            return batched
+        except Exception as e:
+            logger.error("Error during batched similarity search: %s", e)
+            return [[] for _ in queries]
+    
+    def similarity_search_with_score_batch(self, queries: List[str], k: int = 4) -> List[List[tuple]]:
+        """Search for similar documents with distance scores for several queries in one Chroma query"""
+        if not queries:
+            return []
+        
+        try:
+            results = self._query_batch(queries, k, ["documents", "metadatas", "distances"])
+            
+            batched = []
+            for ids, texts, metadatas, distances in zip(results["ids"], results["documents"], results["metadatas"], results["distances"]):
+                batched.append([
+                    (Document(id=doc_id, page_content=text, metadata=metadata or {}), distance)
+                    for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+                ])
+            logger.debug("Found similar documents with scores for %d queries in one batch", len(queries))
+            return batched
+        except Exception as e:
+            logger.error("Error during batched similarity search with score: %s", e)
+            return [[] for _ in queries]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, where_document: Optional[dict] = None) -> List[tuple]:
+        """Search for similar documents with similarity scores, optionally filtered inside Chroma"""
+        try:
+            results = self.vector_store.similarity_search_with_score(query, k=k, filter=filter, where_document=where_document)
+            logger.debug("Found %d similar documents with scores for query: '%.50s...'", len(results), query)
             return results
         except Exception as e:
-            print(f"Error during similarity search with score: {e}")
+            logger.error("Error during similarity search with score: %s", e)
+            return []
+    
+    def get_sources(self) -> List[str]:
+        """Distinct source values in the collection, rescanned only when the document count changes"""
+        try:
+            collection = self.vector_store._collection
+            count = collection.count()
+            if self._sources is None or self._sources[0] != count:
+                metadatas = collection.get(include=["metadatas"])["metadatas"]
+                sources = sorted({metadata.get('source') for metadata in metadatas if metadata and metadata.get('source')})
+                self._sources = (count, sources)
+            return list(self._sources[1])
+        except Exception as e:
+            logger.error("Error listing collection sources: %s", e)
             return []
     
     def get_collection_info(self) -> dict:
-        """Get information about the vector store collection"""
+        """Get information about the vector store collection, reused for COLLECTION_INFO_TTL seconds between writes"""
+        cached = self._collection_info
+        if cached is not None and time.monotonic() - cached[0] < COLLECTION_INFO_TTL:
+            return dict(cached[1])
         try:
             collection = self.vector_store._collection
             count = collection.count()
             
-            return {
+            info = {
                 "collection_name": self.collection_name,
                 "total_documents": count,
                 "persist_directory": self.persist_directory,
-                "embedding_function": str(type(self.embedding_function).__name__)
+                "embedding_function": str(type(self.embedding_function.embeddings).__name__)
             }
+            self._collection_info = (time.monotonic(), info)
+            return dict(info)
         except Exception as e:
-            print(f"Error getting collection info: {e}")
+            logger.error("Error getting collection info: %s", e)
             return {}
     
     def print_collection_summary(self):
@@ -121,31 +317,59 @@ class VectorStore:
     def clear_collection(self) -> bool:
         """Clear all documents from the collection"""
         try:
-            print("Clearing vector store collection...")
+            logger.info("Clearing vector store collection...")
             self.vector_store._collection.delete(where={})
-            print("Vector store collection cleared successfully")
+            self._collection_info = None
+            logger.info("Vector store collection cleared successfully")
             return True
         except Exception as e:
-            print(f"Error clearing collection: {e}")
+            logger.error("Error clearing collection: %s", e)
             return False
     
     def delete_documents(self, where_clause: dict) -> bool:
         """Delete documents based on a where clause"""
         try:
-            print(f"Deleting documents with criteria: {where_clause}")
+            logger.info("Deleting documents with criteria: %s", where_clause)
             self.vector_store._collection.delete(where=where_clause)
-            print("Documents deleted successfully")
+            self._collection_info = None
+            logger.info("Documents deleted successfully")
             return True
         except Exception as e:
-            print(f"Error deleting documents: {e}")
+            logger.error("Error deleting documents: %s", e)
             return False
     
     def reload(self):
-        """Reload the vector store from disk"""
+        """Reload the vector store from disk, unless chroma.sqlite3 and the persist directory are unchanged since it was opened"""
         try:
-            print("Reloading vector store from disk...")
+            try:
+                unchanged = self._last_mtime is not None and self._persisted_mtime() == self._last_mtime
+            except OSError:
+                # e.g. the DB folder was deleted; re-initialize to recreate an empty store
+                unchanged = False
+            if unchanged:
+                logger.info("Vector store unchanged on disk, skipping reload")
+                return
+            logger.info("Reloading vector store from disk...")
             self._initialize_vector_store()
-            print("Vector store reloaded successfully")
+            logger.info("Vector store reloaded successfully")
         except Exception as e:
-            print(f"Error reloading vector store: {e}")
+            logger.error("Error reloading vector store: %s", e)
             raise
+
+_shared_vector_stores = {}
+_shared_vector_stores_lock = threading.Lock()
+
+def get_shared_vector_store(embedding_function, collection_name: str = "rag_documents", persist_directory: str = None) -> VectorStore:
+    """Get a process-wide VectorStore per (collection, directory, embedding function), opening Chroma only once"""
+    key = (collection_name, persist_directory or get_chroma_persist_directory(), id(embedding_function))
+    with _shared_vector_stores_lock:
+        store = _shared_vector_stores.get(key)
+        if store is None:
+            store = VectorStore(embedding_function, collection_name=collection_name, persist_directory=key[1])
+            _shared_vector_stores[key] = store
+        return store
+
+def clear_shared_vector_stores():
+    """Drop the shared vector stores so the next get_shared_vector_store call reopens Chroma"""
+    with _shared_vector_stores_lock:
+        _shared_vector_stores.clear()
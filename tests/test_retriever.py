@@ -0,0 +1,15 @@
+import pytest
+from retrieval.retriever import _is_literal
+
+@pytest.mark.parametrize("query, expected", [
+    ('"exact quoted phrase here"', True),
+    ("source:report.pdf", True),
+    ("invoice", True),
+    ("quarterly revenue", True),
+    ("what does the report say about revenue", False),
+    ('"', True),
+    ("", True),
+    ("   ", True),
+])
+def test_is_literal(query, expected):
+    assert _is_literal(query) is expected
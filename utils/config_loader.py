@@ -1,9 +1,88 @@
+import logging
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
 
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Application settings, parsed and validated once per environment load"""
+    groq_api_key: Optional[str]
+    chroma_persist_dir: str
+    embedding_model: str
+    embedding_device: str
+    cache_embeddings: bool
+    embedding_cache_path: str
+    embed_batch_size: int
+    chunk_size: int
+    chunk_overlap: int
+    text_splitter: str
+    groq_model: str
+    temperature: float
+    log_level: str
+    max_workers: int
+    retriever_threads: int
+    
+    def __post_init__(self):
+        """Reject settings that would otherwise fail deep inside ingestion or retrieval"""
+        for name in ("embed_batch_size", "chunk_size", "max_workers", "retriever_threads"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"Setting {name} must be positive, got {getattr(self, name)}")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError(f"CHUNK_OVERLAP ({self.chunk_overlap}) must be non-negative and smaller than CHUNK_SIZE ({self.chunk_size})")
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Parse settings from the current environment"""
+        return cls(
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            chroma_persist_dir=os.getenv("CHROMA_PERSIST_DIR", "./chroma_db"),
+            embedding_model=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+            embedding_device=os.getenv("EMBEDDING_DEVICE", "auto"),
+            cache_embeddings=os.getenv("CACHE_EMBEDDINGS", "true").lower() == "true",
+            embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite"),
+            embed_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64")),
+            chunk_size=int(os.getenv("CHUNK_SIZE", "1000")),
+            chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "200")),
+            text_splitter=os.getenv("TEXT_SPLITTER", "recursive"),
+            groq_model=os.getenv("GROQ_MODEL", "llama3-70b-8192"),
+            temperature=float(os.getenv("TEMPERATURE", "0.7")),
+            log_level=os.getenv("LOG_LEVEL", "INFO"),
+            max_workers=int(os.getenv("MAX_WORKERS", "4")),
+            retriever_threads=int(os.getenv("RETRIEVER_THREADS", str(os.cpu_count() or 4))),
+        )
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the settings for the current environment, built on first use after each (re)load"""
+    return Settings.from_env()
+
+def refresh_settings():
+    """Forget the parsed settings so the next access re-reads the environment"""
+    get_settings.cache_clear()
+
+# Package loggers whose level follows LOG_LEVEL
+PROJECT_LOGGERS = ("retrieval",)
+
+@lru_cache(maxsize=None)
 def load_environment():
-    """Load environment variables from .env file"""
-    load_dotenv()
+    """Load environment variables from .env file (parsed once per process)"""
+    load_dotenv(override=False)
+    refresh_settings()
+    configure_logging()
+
+def configure_logging():
+    """Send project log records to stderr at LOG_LEVEL; below it, log calls cost only a level check"""
+    level = logging.getLevelName(get_log_level().upper())
+    for name in PROJECT_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(level if isinstance(level, int) else logging.INFO)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.propagate = False
 
 def get_env_variable(key: str, default: str = None) -> str:
     """Get environment variable value"""
@@ -14,28 +93,63 @@ def get_env_variable(key: str, default: str = None) -> str:
 
 def get_groq_api_key() -> str:
     """Get Groq API key from environment variables"""
-    return get_env_variable("GROQ_API_KEY")
+    value = get_settings().groq_api_key
+    if value is None:
+        raise ValueError("Environment variable GROQ_API_KEY is not set")
+    return value
 
 def get_chroma_persist_directory() -> str:
     """Get Chroma DB persistence directory"""
-    return os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+    return get_settings().chroma_persist_dir
 
 def get_embedding_model_name() -> str:
     """Get embedding model name"""
-    return os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    return get_settings().embedding_model
+
+def get_embedding_device() -> str:
+    """Get embedding device ('auto' picks CUDA, then MPS, then CPU)"""
+    return get_settings().embedding_device
+
+def get_cache_embeddings() -> bool:
+    """Get whether computed embeddings are cached on disk"""
+    return get_settings().cache_embeddings
+
+def get_embedding_cache_path() -> str:
+    """Get the on-disk embedding cache file"""
+    return get_settings().embedding_cache_path
+
+def get_embed_batch_size() -> int:
+    """Get number of texts embedded and written per vector store add call"""
+    return get_settings().embed_batch_size
 
 def get_chunk_size() -> int:
     """Get chunk size for document splitting"""
-    return int(os.getenv("CHUNK_SIZE", "1000"))
+    return get_settings().chunk_size
 
 def get_chunk_overlap() -> int:
     """Get chunk overlap for document splitting"""
-    return int(os.getenv("CHUNK_OVERLAP", "200"))
+    return get_settings().chunk_overlap
+
+def get_text_splitter() -> str:
+    """Get text splitter ('recursive' for LangChain's splitter, 'offset' for the sliding-window one)"""
+    return get_settings().text_splitter
 
 def get_groq_model_name() -> str:
     """Get Groq model name"""
-    return os.getenv("GROQ_MODEL", "llama3-70b-8192")
+    return get_settings().groq_model
 
 def get_temperature() -> float:
     """Get temperature for LLM generation"""
-    return float(os.getenv("TEMPERATURE", "0.7"))
+    return get_settings().temperature
+
+def get_log_level() -> str:
+    """Get log level for project loggers"""
+    return get_settings().log_level
+
+def get_max_workers() -> int:
+    """Get maximum number of concurrent workers"""
+    return get_settings().max_workers
+
+def get_retriever_threads() -> int:
+    """Get number of threads used for per-query retrieval and reranking work"""
+    return get_settings().retriever_threads
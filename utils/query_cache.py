@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Answered queries remembered across sessions before the least recently used is evicted
+QUERY_CACHE_SIZE = 512
+# Query embeddings kept for paraphrase matching (oldest evicted first) and the cosine needed for a hit
+SEMANTIC_CACHE_SIZE = 1024
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+class QueryCache:
+    """Thread-safe LRU of answered queries, keyed by a hash of the normalized query text"""
+    
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        """Initialize an empty cache holding at most maxsize entries"""
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(query: str) -> str:
+        """Hash the stripped, lowercased query"""
+        return hashlib.blake2b(query.strip().lower().encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get(self, query: str):
+        """Return the cached (answer, sources) for a query, or None"""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, query: str, answer: str, sources: list):
+        """Remember the answer and sources for a query"""
+        key = self._key(query)
+        with self._lock:
+            self._entries[key] = (answer, sources)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Forget every cached answer, e.g. after the index or LLM settings change"""
+        with self._lock:
+            self._entries.clear()
+
+class SemanticQueryCache:
+    """FIFO cache of answers keyed by query embedding, matched by cosine similarity"""
+    
+    def __init__(self, maxsize: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        """Initialize an empty cache; the embedding matrix is allocated on first insert"""
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._vectors = None
+        self._entries = [None] * maxsize
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 array"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, vector):
+        """Return the cached (answer, sources) of the most similar query above the threshold, or None"""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._size:
+                return None
+            similarities = self._vectors[:self._size] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._entries[best]
+            return None
+    
+    def put(self, vector, answer: str, sources: list):
+        """Remember an answer under its query embedding, overwriting the oldest entry when full"""
+        query = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.empty((self.maxsize, query.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = query
+            self._entries[self._next] = (answer, sources)
+            self._next = (self._next + 1) % self.maxsize
+            self._size = min(self._size + 1, self.maxsize)
+    
+    def clear(self):
+        """Forget every cached answer"""
+        with self._lock:
+            self._entries = [None] * self.maxsize
+            self._size = 0
+            self._next = 0
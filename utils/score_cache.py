@@ -0,0 +1,51 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+# Seconds a cached (query, document) score stays valid
+SCORE_CACHE_TTL = 15 * 60
+
+class ScoreCache:
+    """Thread-safe in-memory cache of reranker scores keyed by (query hash, document hash), with a TTL"""
+    
+    def __init__(self, ttl: float = SCORE_CACHE_TTL):
+        """Create an empty cache whose entries expire after ttl seconds"""
+        self.ttl = ttl
+        self._scores: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+    
+    @staticmethod
+    def make_key(text: str) -> str:
+        """Hash a query or document text into a compact cache key"""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get_many(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        """Return the unexpired cached scores among the given keys"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._scores.get(key)
+                if entry is not None and now - entry[1] < self.ttl:
+                    found[key] = entry[0]
+        return found
+    
+    def put_many(self, scores: Dict[Tuple[str, str], float]):
+        """Store freshly computed scores, dropping expired entries at most once per TTL period"""
+        now = time.monotonic()
+        with self._lock:
+            for key, score in scores.items():
+                self._scores[key] = (float(score), now)
+            if now - self._last_prune >= self.ttl:
+                self._scores = {key: entry for key, entry in self._scores.items() if now - entry[1] < self.ttl}
+                self._last_prune = now
+    
+    def clear(self):
+        """Drop all cached scores"""
+        with self._lock:
+            self._scores.clear()
+    
+    def __len__(self) -> int:
+        return len(self._scores)